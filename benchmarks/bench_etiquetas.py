@@ -0,0 +1,216 @@
+"""Benchmark reproducible del proceso de etiquetas.
+
+Genera catálogos sintéticos (nombres de largo variable, stock desigual y códigos de
+barras faltantes) y mide cada etapa: lectura del Excel, generación de códigos de
+barras, preparación de datos, dibujo de etiquetas y generación completa del PDF.
+Cada tamaño se ejecuta en un proceso aparte para medir su memoria máxima (RSS).
+
+Uso:
+    python benchmarks/bench_etiquetas.py --tamanios 100,1000,10000
+    python benchmarks/bench_etiquetas.py --tamanios 1000000 --formato csv
+
+Los resultados se añaden como una línea JSON por ejecución al archivo de salida,
+junto con el commit actual, para comparar regresiones entre versiones.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+
+# Por encima de este número de etiquetas no se mide generar_datos_etiquetas(), que
+# construye una lista con un DatosEtiqueta por unidad en stock: aunque cada uno es
+# una tupla ligera, la lista crece con el total de etiquetas y no con los productos
+MAX_ETIQUETAS_EXPANDIDAS = 200000
+
+# Número de etiquetas distintas que se dibujan para medir Etiqueta.dibujar
+ETIQUETAS_DIBUJO = 500
+
+PALABRAS = ['Jean', 'Gaby', 'Blue', 'Green', 'Reg.', 'Pant.', 'Semiflare', 'Mom', 'Skinny', 'Wide',
+            'Leg', 'Negro', 'Clásico', 'Tiro', 'Alto', 'Bota', 'Recta', 'Celeste', 'Oversize', 'Premium']
+PALABRAS_LARGAS = ['Extraordinariamente', 'Supercalifragilístico', 'Desestabilizadoramente']
+TALLAS = ['Talla 24', 'Talla 26', 'Talla 28', 'Talla 30', 'Talla 32', 'Talla Única', 'S', 'M', 'L', 'XL']
+PRECIOS = [49.9, 79.9, 99.9, 119.9, 149.9, 189.9, 1299.0]
+
+
+def generar_catalogo(num_etiquetas, semilla=0):
+    """Genera un catálogo sintético con aproximadamente `num_etiquetas` etiquetas en total.
+
+    Args:
+        num_etiquetas: Suma de stock objetivo del catálogo
+        semilla: Semilla del generador aleatorio, para resultados reproducibles
+
+    Returns:
+        DataFrame con las columnas del Excel de productos
+    """
+    import pandas as pd
+
+    aleatorio = random.Random(semilla)
+    filas = []
+    total = 0
+    while total < num_etiquetas:
+        i = len(filas)
+        # Stock desigual: muchos productos con pocas unidades y algunos con cientos
+        stock = min(int(aleatorio.paretovariate(1.2)) - 1, 500) if aleatorio.random() > 0.1 else 0
+        stock = min(stock, num_etiquetas - total)
+        total += stock
+
+        palabras = [aleatorio.choice(PALABRAS) for _ in range(aleatorio.randint(1, 6))]
+        if aleatorio.random() < 0.05:
+            palabras.append(aleatorio.choice(PALABRAS_LARGAS))
+        nombre = ' '.join(palabras)
+
+        filas.append({
+            'Clasificación': 'Producto',
+            'Tipo de producto o servicio': 'Jeans',
+            'Nombre Producto/Servicio': nombre + ' ' + aleatorio.choice(TALLAS),
+            'Nombre Etiqueta': nombre if aleatorio.random() > 0.1 else '',
+            'Variante': aleatorio.choice(TALLAS),
+            'Tamanio': 'Regular',
+            'Fit': 'Pant. Semiflare',
+            'Posicion': 'Cintura',
+            'Marca': 'JOLG',
+            'Código Barras': None if aleatorio.random() < 0.3 else f"6{aleatorio.randrange(10 ** 11):011d}",
+            'SKU': f"BENCH-{i:07d}",
+            'Stock': stock,
+            'Precio handtag': aleatorio.choice(PRECIOS),
+        })
+    return pd.DataFrame(filas)
+
+
+def _medir(funcion, *args, **kwargs):
+    """Ejecuta una función sin su salida por consola y devuelve (resultado, segundos)."""
+    inicio = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        resultado = funcion(*args, **kwargs)
+    return resultado, time.perf_counter() - inicio
+
+
+def medir_tamanio(num_etiquetas, formato, semilla):
+    """Mide todas las etapas para un catálogo de `num_etiquetas` etiquetas.
+
+    Se ejecuta en un proceso propio, por lo que la memoria máxima corresponde solo
+    a este tamaño.
+
+    Returns:
+        Diccionario con los tiempos (segundos), conteos, RSS máximo y bytes por etiqueta
+    """
+    os.chdir(RAIZ)
+    from reportlab.pdfgen import canvas
+    from excel_manager import ExcelManager
+    from etiqueta_pdf import Etiqueta, estadisticas_cache_layout
+    from generador_etiqueta import GeneradorEtiquetas, TAMANIO_ETIQUETA
+
+    resultado = {'etiquetas_objetivo': num_etiquetas, 'formato': formato}
+    catalogo = generar_catalogo(num_etiquetas, semilla)
+    resultado['productos'] = len(catalogo)
+
+    with tempfile.TemporaryDirectory() as temporal:
+        ruta = os.path.join(temporal, f"catalogo.{formato}")
+        if formato == 'csv':
+            catalogo.to_csv(ruta, index=False)
+        else:
+            catalogo.to_excel(ruta, index=False)
+        del catalogo
+
+        # Lectura sin caché y luego desde la copia binaria en caché
+        cache_dir = os.path.join(temporal, "cache")
+        manager = ExcelManager(ruta, cache_dir=cache_dir)
+        _, resultado['cargar_excel_s'] = _medir(manager.cargar_excel)
+        _, resultado['cargar_excel_cache_s'] = _medir(ExcelManager(ruta, cache_dir=cache_dir).cargar_excel)
+
+        skus = manager.data['SKU'].tolist()
+        _, resultado['generar_barcode_s'] = _medir(manager.generar_barcodes, skus)
+
+        grupos, resultado['preparar_grupos_s'] = _medir(lambda: list(manager.iterar_grupos_etiquetas()))
+        resultado['etiquetas'] = sum(copias for _, copias in grupos)
+
+        if resultado['etiquetas'] <= MAX_ETIQUETAS_EXPANDIDAS:
+            _medir(manager.cargar_excel, ruta)
+            datos, resultado['generar_datos_etiquetas_s'] = _medir(manager.generar_datos_etiquetas)
+            del datos
+
+        # Dibujo directo de etiquetas distintas, sin formularios compartidos
+        muestra = [datos for datos, _ in grupos[:ETIQUETAS_DIBUJO]]
+        c = canvas.Canvas(os.path.join(temporal, "dibujo.pdf"), pagesize=TAMANIO_ETIQUETA)
+
+        def dibujar():
+            for datos in muestra:
+                Etiqueta(datos).dibujar(c, 0, 0)
+                c.showPage()
+
+        _, segundos = _medir(dibujar)
+        resultado['dibujar_por_etiqueta_ms'] = segundos * 1000 / max(1, len(muestra))
+        resultado['cache_layout'] = estadisticas_cache_layout()
+
+        # Generación completa del PDF
+        salida = os.path.join(temporal, "etiquetas.pdf")
+        _, resultado['generar_pdf_s'] = _medir(lambda: GeneradorEtiquetas(salida).generar_pdf_grupos(grupos))
+        resultado['pdf_bytes'] = os.path.getsize(salida)
+        resultado['pdf_bytes_por_etiqueta'] = resultado['pdf_bytes'] / max(1, resultado['etiquetas'])
+
+    # ru_maxrss está en KB en Linux y en bytes en macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    resultado['rss_max_mb'] = maxrss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+    return resultado
+
+
+def _commit_actual():
+    """Devuelve el hash del commit actual, o None si no se está en un repositorio git."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del generador de etiquetas")
+    parser.add_argument('--tamanios', default='100,1000,10000',
+                        help="Números de etiquetas a medir, separados por comas (hasta 1000000)")
+    parser.add_argument('--formato', choices=('xlsx', 'csv'), default='xlsx',
+                        help="Formato del catálogo sintético")
+    parser.add_argument('--semilla', type=int, default=0, help="Semilla de los catálogos sintéticos")
+    parser.add_argument('--salida', default=os.path.join(RAIZ, 'benchmarks', 'resultados.jsonl'),
+                        help="Archivo JSON Lines al que se añaden los resultados")
+    args = parser.parse_args()
+
+    ejecucion = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'commit': _commit_actual(),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'resultados': [],
+    }
+
+    for tamanio in (int(valor) for valor in args.tamanios.split(',')):
+        # Un proceso nuevo por tamaño para aislar la memoria máxima
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            resultado = executor.submit(medir_tamanio, tamanio, args.formato, args.semilla).result()
+        ejecucion['resultados'].append(resultado)
+        print(f"{resultado['etiquetas']:>9} etiquetas ({resultado['productos']} productos): "
+              f"cargar {resultado['cargar_excel_s']:.3f}s (caché {resultado['cargar_excel_cache_s']:.3f}s), "
+              f"códigos {resultado['generar_barcode_s']:.3f}s, preparar {resultado['preparar_grupos_s']:.3f}s, "
+              f"dibujar {resultado['dibujar_por_etiqueta_ms']:.2f}ms/etiqueta, pdf {resultado['generar_pdf_s']:.2f}s, "
+              f"{resultado['pdf_bytes_por_etiqueta']:.0f} B/etiqueta, RSS {resultado['rss_max_mb']:.0f} MB")
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.salida)), exist_ok=True)
+    with open(args.salida, 'a', encoding='utf-8') as archivo:
+        archivo.write(json.dumps(ejecucion, ensure_ascii=False) + "\n")
+    print(f"[OK] Resultados añadidos a {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
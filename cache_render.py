@@ -0,0 +1,228 @@
+import reportlab
+from reportlab.pdfgen import canvas
+import os
+import json
+import hashlib
+import instrumentacion
+from generador_etiqueta import TAMANIO_ETIQUETA, CAMPOS_DIBUJADOS, dibujar_grupos, _nombre_formulario
+
+# Versión del diseño de la etiqueta; cambiarla invalida todos los formularios cacheados
+VERSION_DISENO = 2
+
+# Fuentes que usa la etiqueta. Se registran siempre en este orden al crear el PDF para
+# que sus nombres internos (/F1, /F2...) coincidan entre ejecuciones
+FUENTES_ETIQUETA = ('Helvetica', 'Helvetica-Bold', 'Times-Bold')
+
+# Carpeta base de las cachés; cada libro (y hoja) usa su propia subcarpeta
+CACHE_PREDETERMINADA = "output/.cache_etiquetas"
+
+# Versiones principales de ReportLab cuyos atributos internos del canvas (_code y
+# _formsinuse) usa la caché; con otra versión se dibujan todas las etiquetas
+VERSIONES_REPORTLAB_COMPATIBLES = ('3', '4')
+
+
+def _internos_compatibles(c):
+    """Indica si el canvas expone los atributos internos que usa la caché."""
+    return (reportlab.Version.split('.')[0] in VERSIONES_REPORTLAB_COMPATIBLES
+            and isinstance(getattr(c, '_code', None), list)
+            and isinstance(getattr(c, '_formsinuse', None), list))
+
+
+def directorio_cache(excel_path, hoja=None, base=CACHE_PREDETERMINADA):
+    """Devuelve la carpeta de caché de un libro y hoja.
+
+    Cada catálogo tiene su propia caché, de modo que alternar entre varios libros no
+    descarta los formularios de los demás.
+
+    Args:
+        excel_path: Ruta del libro de productos
+        hoja: Hoja del libro (nombre o posición; None para la predeterminada)
+        base: Carpeta base de las cachés
+
+    Returns:
+        Ruta '{base}/{libro}_{hash}', donde el hash distingue la ruta completa y la hoja
+    """
+    nombre = os.path.splitext(os.path.basename(excel_path))[0]
+    clave = f"{os.path.abspath(excel_path)}\x1f{'' if hoja is None else hoja}"
+    return os.path.join(base, f"{nombre}_{hashlib.sha1(clave.encode('utf-8')).hexdigest()[:12]}")
+
+
+def _mtime(path):
+    """Devuelve la fecha de modificación de un archivo, o 0 si no existe."""
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return 0
+
+
+class CacheRender:
+    """Caché persistente para regenerar solo las etiquetas de productos que cambiaron.
+
+    Guarda un manifiesto JSON indexado por SKU con el hash de los campos dibujados y el
+    stock, y las operaciones PDF ya resueltas del formulario de cada producto. En cada
+    ejecución los productos sin cambios reutilizan su formulario tal cual y solo los
+    nuevos o modificados se vuelven a dibujar; el PDF resultante es idéntico al de una
+    generación completa.
+
+    Nota: la reutilización inserta las operaciones capturadas en el flujo del formulario
+    mediante atributos internos del canvas de ReportLab (versión fijada en requirements.txt);
+    con una versión que no los tenga se dibujan todas las etiquetas sin usar la caché.
+    """
+
+    def __init__(self, cache_dir=CACHE_PREDETERMINADA):
+        """Inicializa la caché de etiquetas.
+
+        Args:
+            cache_dir: Carpeta donde se guardan el manifiesto y los formularios
+        """
+        self.cache_dir = cache_dir
+        self.manifiesto_path = os.path.join(cache_dir, "manifiesto.json")
+        self.formularios_path = os.path.join(cache_dir, "formularios.json")
+        self.manifiesto = self._cargar(self.manifiesto_path)
+        self.formularios = self._cargar(self.formularios_path)
+        self._usados = {}
+        self.dibujados = 0
+        self.reutilizados = 0
+
+    def _cargar(self, path):
+        """Lee un archivo de la caché; si no existe, está dañado o es de otra versión, empieza vacío."""
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, encoding="utf-8") as archivo:
+                contenido = json.load(archivo)
+        except (OSError, ValueError) as e:
+            print(f"[AVISO] Caché de etiquetas no válida ({path}), se regenerará: {e}")
+            return {}
+        if contenido.get('version') != VERSION_DISENO:
+            return {}
+        return contenido.get('datos', {})
+
+    def _guardar(self, path, datos):
+        """Escribe un archivo de la caché de forma atómica."""
+        temporal = path + ".tmp"
+        with open(temporal, "w", encoding="utf-8") as archivo:
+            json.dump({'version': VERSION_DISENO, 'datos': datos}, archivo, ensure_ascii=False)
+        os.replace(temporal, path)
+
+    @staticmethod
+    def hash_producto(datos, copias):
+        """Calcula el hash del contenido de un producto: campos dibujados y stock.
+
+        Args:
+            datos: Diccionario con los datos de la etiqueta
+            copias: Número de copias a imprimir
+
+        Returns:
+            String hexadecimal con el hash
+        """
+        valores = [str(datos.get(campo, '')) for campo in CAMPOS_DIBUJADOS] + [str(copias)]
+        return hashlib.sha1("\x1f".join(valores).encode('utf-8')).hexdigest()
+
+    def restaurar_formulario(self, c, nombre, datos):
+        """Inserta en el formulario abierto las operaciones cacheadas del producto.
+
+        Args:
+            c: Canvas con el formulario `nombre` abierto (entre beginForm y endForm)
+            nombre: Nombre del formulario
+            datos: Diccionario con los datos de la etiqueta
+
+        Returns:
+            bool: True si se reutilizó la caché; False si hay que dibujar la etiqueta
+        """
+        entrada = self.formularios.get(nombre)
+        if entrada is None or entrada['logo_mtime'] != _mtime(str(datos.get('image_path', ''))):
+            return False
+        # Las imágenes (logo) deben estar ya incrustadas en este PDF; si no, se dibuja
+        # la etiqueta completa, lo que además las incrusta para los siguientes productos
+        if not all(c.hasForm(recurso) for recurso in entrada['recursos']):
+            return False
+
+        c.addLiteral("\n".join(entrada['operaciones']))
+        c._formsinuse.extend(entrada['recursos'])
+        self._usados[nombre] = entrada
+        self.reutilizados += 1
+        return True
+
+    def guardar_formulario(self, c, nombre, datos):
+        """Captura las operaciones del formulario recién dibujado para próximas ejecuciones.
+
+        Args:
+            c: Canvas con el formulario `nombre` abierto y ya dibujado
+            nombre: Nombre del formulario
+            datos: Diccionario con los datos de la etiqueta
+        """
+        self._usados[nombre] = {
+            'logo_mtime': _mtime(str(datos.get('image_path', ''))),
+            'operaciones': list(c._code),
+            'recursos': list(c._formsinuse),
+        }
+        self.dibujados += 1
+
+    def generar_pdf_incremental(self, grupos_etiquetas, output_file):
+        """Genera el PDF completo reutilizando los formularios de los productos sin cambios.
+
+        Args:
+            grupos_etiquetas: Iterable de tuplas (datos_etiqueta, copias)
+            output_file: Ruta del PDF final
+
+        Returns:
+            Diccionario con el total de etiquetas, los productos modificados y los
+            formularios dibujados y reutilizados
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        nuevo_manifiesto = {}
+        vistos = {}
+        modificados = 0
+
+        def registrar(grupos):
+            # Actualiza el manifiesto por SKU a medida que se dibujan los grupos
+            nonlocal modificados
+            for datos, copias in grupos:
+                if copias <= 0:
+                    continue
+                # Un SKU repetido en el Excel se distingue por su número de aparición
+                sku = str(datos.get('sku', ''))
+                vistos[sku] = vistos.get(sku, 0) + 1
+                clave = sku if vistos[sku] == 1 else f"{sku}#{vistos[sku]}"
+
+                hash_actual = self.hash_producto(datos, copias)
+                anterior = self.manifiesto.get(clave)
+                if anterior is None or anterior['hash'] != hash_actual:
+                    modificados += 1
+                nuevo_manifiesto[clave] = {'hash': hash_actual, 'formulario': _nombre_formulario(datos), 'etiquetas': copias}
+                yield datos, copias
+
+        c = canvas.Canvas(output_file, pagesize=TAMANIO_ETIQUETA)
+        for fuente in FUENTES_ETIQUETA:
+            c.setFont(fuente, 12)
+        c.setFont('Helvetica', 12)
+        usar_cache = _internos_compatibles(c)
+        if not usar_cache:
+            print(f"[AVISO] La caché de etiquetas no es compatible con ReportLab {reportlab.Version}; "
+                  "se dibujarán todas las etiquetas")
+
+        self._usados = {}
+        self.dibujados = self.reutilizados = 0
+        with instrumentacion.etapa('generar_pdf'):
+            total = dibujar_grupos(c, registrar(grupos_etiquetas), cache=self if usar_cache else None)
+            if total == 0:
+                print("[AVISO] No se proporcionaron etiquetas para generar")
+            c.save()
+        instrumentacion.contar('bytes_escritos', os.path.getsize(output_file))
+        instrumentacion.contar('formularios_reutilizados', self.reutilizados)
+
+        # Conservar solo lo usado en esta ejecución: así la caché no crece sin límite
+        if usar_cache:
+            self.manifiesto = nuevo_manifiesto
+            self.formularios = self._usados
+            self._guardar(self.manifiesto_path, self.manifiesto)
+            self._guardar(self.formularios_path, self.formularios)
+        else:
+            self.dibujados = len({entrada['formulario'] for entrada in nuevo_manifiesto.values()})
+
+        print(f"[OK] PDF generado: {output_file} con {total} etiquetas "
+              f"({modificados} productos nuevos o modificados; {self.dibujados} dibujados, "
+              f"{self.reutilizados} reutilizados de la caché)")
+        return {'etiquetas': total, 'modificados': modificados,
+                'dibujados': self.dibujados, 'reutilizados': self.reutilizados}
@@ -0,0 +1,158 @@
+"""Consultas rápidas sobre el Excel o CSV de productos usando solo la biblioteca estándar.
+
+Cuenta productos y etiquetas y valida el archivo sin importar pandas, ReportLab ni PIL,
+por lo que responde en milisegundos. Aplica las mismas reglas que ExcelManager: el
+stock se interpreta como lo haría int() y los valores no válidos cuentan como 0.
+"""
+import csv
+import math
+import os
+import re
+
+from xlsx_rapido import leer_filas_xlsx
+
+# Columnas que se revisan en las consultas rápidas
+COLUMNAS_REVISADAS = ('SKU', 'Stock', 'Código Barras', 'Nombre Etiqueta', 'Nombre Producto/Servicio', 'Precio handtag')
+
+# Columnas sin las cuales no se pueden generar etiquetas útiles
+COLUMNAS_OBLIGATORIAS = ('SKU', 'Stock', 'Precio handtag')
+
+_ENTERO_RE = re.compile(r'\s*[+-]?\d+\s*')
+
+
+def leer_filas(path, hoja=None, columnas=None):
+    """Recorre las filas de datos de un .xlsx o .csv.
+
+    Args:
+        path: Ruta del archivo
+        hoja: Hoja del Excel (nombre, posición o None para la primera); se ignora en CSV
+        columnas: Encabezados de las columnas a devolver (None para todas)
+
+    Yields:
+        Primero la lista de encabezados y después un diccionario por fila de datos
+        con las columnas pedidas que tengan valor
+    """
+    if path.lower().endswith('.csv'):
+        with open(path, newline='', encoding='utf-8-sig') as archivo:
+            lector = csv.reader(archivo)
+            encabezados = next(lector, [])
+            yield encabezados
+            indices = [(i, nombre) for i, nombre in enumerate(encabezados) if columnas is None or nombre in columnas]
+            for fila in lector:
+                yield {nombre: fila[i] for i, nombre in indices if i < len(fila) and fila[i] != ''}
+    else:
+        yield from leer_filas_xlsx(path, hoja, columnas)
+
+
+def _es_vacio(valor):
+    """Indica si un valor corresponde a una celda vacía."""
+    return valor is None or (isinstance(valor, float) and math.isnan(valor)) or str(valor).strip() == ''
+
+
+def stock_entero(valor, texto_numerico=False):
+    """Convierte un valor de stock con la misma semántica que ExcelManager.
+
+    Args:
+        valor: Valor leído de la celda
+        texto_numerico: Si es True (CSV), los textos con decimales se aceptan como
+            números, igual que cuando pandas infiere la columna como numérica
+
+    Returns:
+        Tupla (stock, valido); el stock es 0 cuando el valor no es válido
+    """
+    if isinstance(valor, bool):
+        return int(valor), True
+    if isinstance(valor, (int, float)):
+        if isinstance(valor, float) and not math.isfinite(valor):
+            return 0, False
+        return int(valor), True
+    if valor is None:
+        return 0, False
+    if _ENTERO_RE.fullmatch(valor):
+        return int(valor), True
+    if texto_numerico:
+        try:
+            numero = float(valor)
+        except ValueError:
+            return 0, False
+        if math.isfinite(numero):
+            return int(numero), True
+    return 0, False
+
+
+def revisar_catalogo(path, hoja=None, skus=None, filas=None, max_problemas=20):
+    """Cuenta los productos y etiquetas de un archivo y detecta problemas en sus datos.
+
+    Args:
+        path: Ruta del Excel o CSV
+        hoja: Hoja del Excel (nombre, posición o None para la primera)
+        skus: Conjunto de SKU a considerar (None para todos)
+        filas: Tupla (primera, última) con los números de producto a considerar,
+            empezando en 1 (None para todos)
+        max_problemas: Número máximo de avisos por fila que se detallan
+
+    Returns:
+        Diccionario con 'productos', 'con_stock', 'etiquetas', 'sin_codigo', 'errores'
+        (impiden generar) y 'avisos' (se generan igualmente, con valores por defecto)
+    """
+    resumen = {'productos': 0, 'con_stock': 0, 'etiquetas': 0, 'sin_codigo': 0, 'errores': [], 'avisos': []}
+    if not os.path.exists(path):
+        resumen['errores'].append(f"El archivo no existe: {path}")
+        return resumen
+
+    es_csv = path.lower().endswith('.csv')
+    avisos_omitidos = 0
+    vistos = {}
+    try:
+        filas_leidas = leer_filas(path, hoja, COLUMNAS_REVISADAS)
+        encabezados = next(filas_leidas)
+        faltantes = [nombre for nombre in COLUMNAS_OBLIGATORIAS if nombre not in encabezados]
+        if faltantes:
+            resumen['errores'].append(f"Faltan columnas: {', '.join(faltantes)}")
+        if 'Nombre Etiqueta' not in encabezados and 'Nombre Producto/Servicio' not in encabezados:
+            resumen['avisos'].append("No hay columna 'Nombre Etiqueta' ni 'Nombre Producto/Servicio'")
+
+        for numero, fila in enumerate(filas_leidas, start=1):
+            if filas is not None and not filas[0] <= numero <= filas[1]:
+                continue
+            sku = fila.get('SKU')
+            if skus is not None and str(sku) not in skus:
+                continue
+            resumen['productos'] += 1
+
+            problemas = []
+            stock, valido = stock_entero(fila.get('Stock'), es_csv)
+            if not valido:
+                problemas.append(f"stock no válido ({fila.get('Stock')!r}), se usará 0")
+            if stock > 0:
+                resumen['con_stock'] += 1
+                resumen['etiquetas'] += stock
+            if _es_vacio(fila.get('Código Barras')):
+                resumen['sin_codigo'] += 1
+            if _es_vacio(sku):
+                problemas.append("sin SKU")
+            else:
+                anterior = vistos.setdefault(str(sku), numero)
+                if anterior != numero:
+                    problemas.append(f"SKU repetido (también en el producto {anterior})")
+
+            # Un precio vacío es un dato faltante (NaN en pandas), no un precio no numérico
+            precio = fila.get('Precio handtag')
+            if isinstance(precio, str) and precio != '':
+                try:
+                    float(precio)
+                except ValueError:
+                    resumen['errores'].append(f"Producto {numero}: precio no numérico ({precio!r})")
+
+            for problema in problemas:
+                if len(resumen['avisos']) < max_problemas:
+                    resumen['avisos'].append(f"Producto {numero} (SKU {sku}): {problema}")
+                else:
+                    avisos_omitidos += 1
+    except Exception as e:
+        # Hoja inexistente, zip dañado, CSV con otra codificación...
+        resumen['errores'].append(f"No se pudo leer el archivo: {e}")
+
+    if avisos_omitidos:
+        resumen['avisos'].append(f"... y {avisos_omitidos} avisos más")
+    return resumen
@@ -1,19 +1,350 @@
-from reportlab.pdfgen import canvas
 from reportlab.lib.units import cm, mm
-from reportlab.lib.pagesizes import letter, A4
 from reportlab.graphics.barcode import code128
 from reportlab.lib import colors
-from PIL import Image
+from reportlab.pdfbase.pdfdoc import PDFImageXObject, PDFObjectReference
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen.canvas import _digester
+from collections import namedtuple
+from functools import lru_cache
+import copy
 import os
+import instrumentacion
+
+# Número máximo de combinaciones (nombre, talla, precio) con layout en caché
+TAMANIO_CACHE_LAYOUT = 4096
+
+# Número máximo de códigos de barras distintos con su patrón de barras en caché
+TAMANIO_CACHE_BARCODE = 4096
+
+# Ancho de la barra más estrecha (módulo) del código de barras
+ANCHO_MODULO_BARCODE = 0.35 * mm
+
+# Medidas fijas de la etiqueta, en puntos
+GeometriaEtiqueta = namedtuple('GeometriaEtiqueta', [
+    'ancho',             # Ancho de la etiqueta
+    'alto',              # Alto de la etiqueta
+    'margen',            # Margen interno para que nada se salga de los bordes
+    'ancho_util',        # Ancho disponible para el contenido
+    'espacio_vertical',  # Espacio vertical reservado entre elementos
+])
+
+# Etiqueta de 50 x 38 mm; la comparten todas las instancias de Etiqueta
+GEOMETRIA_ETIQUETA = GeometriaEtiqueta(
+    ancho=50 * mm,
+    alto=38 * mm,
+    margen=0.12 * cm,
+    ancho_util=50 * mm - 2 * 0.12 * cm,
+    espacio_vertical=0.12 * cm,
+)
+
+# Posiciones verticales relativas al inicio del bloque de texto (debajo del separador)
+LayoutTexto = namedtuple('LayoutTexto', [
+    'nombre_font',    # Tamaño de fuente del nombre del producto
+    'nombre_lineas',  # Tupla de (texto, desplazamiento vertical) por línea del nombre
+    'talla_font',     # Tamaño de fuente de la talla
+    'talla_dy',       # Desplazamiento vertical de la línea de talla
+    'precio_font',    # Tamaño de fuente del precio
+    'precio_ancho',   # Ancho del recuadro del precio
+    'precio_dy',      # Desplazamiento vertical de la base del recuadro del precio
+])
+
+
+@lru_cache(maxsize=TAMANIO_CACHE_LAYOUT)
+def calcular_layout_texto(product_name, talla, precio, content_width, v_spacing):
+    """Resuelve el ajuste de texto de una etiqueta: tamaños de fuente, corte del nombre
+    en líneas y posiciones verticales. El resultado se guarda en una caché LRU, por lo
+    que las etiquetas con los mismos textos y estilo no vuelven a medir nada.
+
+    Args:
+        product_name: Nombre del producto
+        talla: Texto de la talla
+        precio: Texto del precio
+        content_width: Ancho útil de la etiqueta en puntos
+        v_spacing: Espacio vertical entre elementos en puntos
+
+    Returns:
+        LayoutTexto con las fuentes y desplazamientos relativos al inicio del texto
+    """
+    text_y = 0
+
+    # Nombre del producto: ajustar tamaño de fuente o dividir en hasta 2 líneas
+    # para que quepa en content_width
+    max_font = 12
+    min_font = 8
+    nombre_font = None
+    nombre_lineas = None
+    for font in range(max_font, min_font - 1, -1):
+        if stringWidth(product_name, "Helvetica-Bold", font) <= content_width:
+            # cabe en una sola línea
+            nombre_font, nombre_lineas = font, ((product_name, 0),)
+            text_y -= (font / 72.0) * cm + v_spacing
+            break
+        # probar dividir en dos líneas: buscar punto de corte por palabras
+        words = product_name.split()
+        for split_index in range(1, len(words)):
+            first = ' '.join(words[:split_index])
+            second = ' '.join(words[split_index:])
+            if (stringWidth(first, "Helvetica-Bold", font) <= content_width
+                    and stringWidth(second, "Helvetica-Bold", font) <= content_width):
+                nombre_font = font
+                nombre_lineas = ((first, font * 0.35), (second, -font * 0.35))
+                text_y -= (font / 72.0) * cm * 2 + v_spacing
+                break
+        if nombre_font is not None:
+            break
+    else:
+        # Si baja del min_font, cortar y mostrar primera parte con '...'.
+        # El ancho crece con el largo del prefijo, así que se busca por bisección
+        # el prefijo más largo que quepa con min_font
+        bajo, alto = 0, len(product_name)
+        while bajo < alto:
+            medio = (bajo + alto + 1) // 2
+            if stringWidth(product_name[:medio] + '...', "Helvetica-Bold", min_font) <= content_width:
+                bajo = medio
+            else:
+                alto = medio - 1
+        nombre_font = min_font
+        nombre_lineas = ((product_name[:bajo] + '...', 0),)
+        text_y -= (min_font / 72.0) * cm + v_spacing
+
+    # Talla (directamente debajo del nombre del producto), ajustada al ancho disponible
+    talla_dy = text_y - v_spacing
+    talla_font = 14
+    while talla_font > 8 and stringWidth(talla, "Helvetica-Bold", talla_font) > content_width:
+        talla_font -= 1
+    text_y = talla_dy - (talla_font / 72.0) * cm - v_spacing
+
+    # Precio: ajuste de fuente y dimensiones del cuadro, no mayor que content_width
+    precio_y = text_y - v_spacing
+    precio_font = 11
+    while precio_font > 6 and stringWidth(precio, "Helvetica-Bold", precio_font) > content_width - (0.3 * cm):
+        precio_font -= 1
+    padding_px = 6  # puntos
+    precio_ancho = min(content_width, stringWidth(precio, "Helvetica-Bold", precio_font) + padding_px)
+
+    return LayoutTexto(nombre_font, nombre_lineas, talla_font, talla_dy,
+                       precio_font, precio_ancho, precio_y - 0.05 * cm)
+
+
+def estadisticas_cache_layout():
+    """Devuelve los contadores de la caché de layout de texto.
+
+    Returns:
+        Diccionario con aciertos, fallos, entradas actuales y tamaño máximo
+    """
+    info = calcular_layout_texto.cache_info()
+    return {'aciertos': info.hits, 'fallos': info.misses,
+            'entradas': info.currsize, 'maximo': info.maxsize}
+
+
+def limpiar_cache_layout():
+    """Vacía la caché de layout de texto y reinicia sus contadores."""
+    calcular_layout_texto.cache_clear()
+
+
+instrumentacion.registrar_medidor('cache_layout', estadisticas_cache_layout)
+
+
+# Barras de un código ya codificado: tuplas (inicio, ancho) en módulos desde la primera
+# barra, con las barras contiguas unidas, y las zonas de silencio en puntos
+PatronBarcode = namedtuple('PatronBarcode', ['barras', 'modulos', 'silencio_izq', 'silencio_der'])
+
+
+@lru_cache(maxsize=TAMANIO_CACHE_BARCODE)
+def patron_code128(valor):
+    """Codifica un valor en Code128 y devuelve su patrón de barras.
+
+    La codificación la hace ReportLab (mismas barras y zonas de silencio que el widget
+    Code128); el resultado se guarda en una caché LRU por valor.
+
+    Args:
+        valor: Texto del código de barras
+
+    Returns:
+        PatronBarcode con las barras en módulos y las zonas de silencio en puntos
+    """
+    codigo = code128.Code128(valor, barWidth=ANCHO_MODULO_BARCODE, humanReadable=False)
+    codigo.width  # Calcula la codificación (decomposed)
+
+    barras = []
+    posicion = 0
+    for simbolo in codigo.decomposed:
+        # Mayúsculas: barra de N módulos ('A' = 1); minúsculas: espacio de N módulos
+        if simbolo.isupper():
+            ancho = ord(simbolo) - ord('A') + 1
+            if barras and barras[-1][0] + barras[-1][1] == posicion:
+                barras[-1] = (barras[-1][0], barras[-1][1] + ancho)
+            else:
+                barras.append((posicion, ancho))
+        else:
+            ancho = ord(simbolo) - ord('a') + 1
+        posicion += ancho
+    return PatronBarcode(tuple(barras), posicion, codigo.lquiet, codigo.rquiet)
+
+
+def ancho_barcode(patron):
+    """Ancho total en puntos de un código de barras, incluidas sus zonas de silencio."""
+    return patron.silencio_izq + patron.modulos * ANCHO_MODULO_BARCODE + patron.silencio_der
+
+
+def dibujar_barcode(c, patron, x, y, alto, escala_x=1.0):
+    """Dibuja un código de barras como un único trazado relleno.
+
+    Las barras se escriben en módulos enteros dentro de una transformación, por lo
+    que cada una ocupa unos pocos bytes en el flujo del PDF.
+
+    Args:
+        c: Objeto canvas de ReportLab (con el color de relleno ya elegido)
+        patron: PatronBarcode a dibujar
+        x, y: Esquina inferior izquierda del código, incluida la zona de silencio
+        alto: Alto de las barras en puntos
+        escala_x: Escala horizontal aplicada a todo el código
+    """
+    c.saveState()
+    c.transform(escala_x * ANCHO_MODULO_BARCODE, 0, 0, alto, x + patron.silencio_izq * escala_x, y)
+    trazado = c.beginPath()
+    for inicio, ancho in patron.barras:
+        trazado.rect(inicio, 0, ancho, 1)
+    c.drawPath(trazado, stroke=0, fill=1)
+    c.restoreState()
+
+
+def estadisticas_cache_barcode():
+    """Devuelve los contadores de la caché de patrones de código de barras."""
+    info = patron_code128.cache_info()
+    return {'aciertos': info.hits, 'fallos': info.misses,
+            'entradas': info.currsize, 'maximo': info.maxsize}
+
+
+instrumentacion.registrar_medidor('cache_barcode', estadisticas_cache_barcode)
+
+class LogoCacheado:
+    """Logo ya codificado para el PDF y compartido por todos los PDF del proceso."""
+
+    # Máscara con la que se dibuja el logo (la misma que se pasa a drawImage)
+    MASCARA = 'auto'
+
+    def __init__(self, path):
+        """Lee la imagen una sola vez y guarda sus datos ya codificados y su tamaño en píxeles.
+
+        Args:
+            path: Ruta al archivo de imagen
+        """
+        self.path = path
+        # Nombre con el que drawImage(path) busca la imagen en el PDF
+        self.nombre = _digester(f"{path}{self.MASCARA}")
+        # El JPEG tal cual o el mapa de bits ya comprimido, como lo incrusta ReportLab
+        self.imagen = PDFImageXObject(self.nombre, path, mask=self.MASCARA)
+        self.ancho_px, self.alto_px = self.imagen.width, self.imagen.height
+        self._escalas = {}
+
+    def incrustar(self, c):
+        """Registra la imagen ya codificada en el PDF del canvas si aún no está.
+
+        Así drawImage(path) la encuentra por su nombre y no vuelve a abrir ni a
+        codificar el archivo en cada PDF (cada trabajo del servicio, cada parte). Si el
+        canvas no tiene los atributos internos esperados, no hace nada y drawImage lee
+        el archivo como de costumbre.
+
+        Args:
+            c: Canvas de ReportLab en el que se va a dibujar el logo
+        """
+        doc = getattr(c, '_doc', None)
+        if doc is None or not hasattr(c, '_setXObjects'):
+            return
+        registro = doc.getXObjectName(self.nombre)
+        if registro in doc.idToObject:
+            return
+
+        # Copia por PDF: ReportLab le asigna los recursos y la referencia de su máscara
+        imagen = copy.copy(self.imagen)
+        c._setXObjects(imagen)
+        doc.Reference(imagen, registro)
+        doc.addForm(self.nombre, imagen)
+        mascara = getattr(imagen, '_smask', None)
+        if mascara is not None:
+            registro_mascara = doc.getXObjectName(mascara.name)
+            if registro_mascara in doc.idToObject:
+                imagen.smask = PDFObjectReference(registro_mascara)
+            else:
+                mascara = copy.copy(mascara)
+                c._setXObjects(mascara)
+                imagen.smask = doc.Reference(mascara, registro_mascara)
+            del imagen._smask
+
+    def escalar(self, ancho):
+        """Calcula el tamaño del logo escalado a un ancho dado, conservando la proporción.
+
+        Args:
+            ancho: Ancho deseado en puntos
+
+        Returns:
+            Tupla (ancho, alto) en puntos
+        """
+        escala = self._escalas.get(ancho)
+        if escala is None:
+            escala = self._escalas[ancho] = (ancho, self.alto_px * (ancho / self.ancho_px))
+        return escala
+
+
+# Logos cargados por ruta, junto con la fecha de modificación con la que se leyeron
+_cache_logos = {}
+
+
+def cargar_logo(path):
+    """Devuelve el logo cacheado de una ruta, leyéndolo solo la primera vez o si cambió.
+
+    Args:
+        path: Ruta al archivo de imagen
+
+    Returns:
+        LogoCacheado, o None si el archivo no existe
+    """
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+    entrada = _cache_logos.get(path)
+    if entrada is None or entrada[0] != mtime:
+        entrada = _cache_logos[path] = (mtime, LogoCacheado(path))
+    return entrada[1]
+
+
+# Posición de todos los elementos de una etiqueta, en puntos con origen en la esquina
+# inferior izquierda; la comparten el PDF y los formatos de impresora (ver etiqueta_zpl)
+DisposicionEtiqueta = namedtuple('DisposicionEtiqueta', [
+    'logo',             # (x, y, ancho, alto) del logo, o None si no hay imagen
+    'separador',        # (x1, x2, y) de la línea decorativa bajo el logo
+    'centro_x',         # Centro horizontal de los textos
+    'layout',           # LayoutTexto con las fuentes y los cortes del nombre
+    'texto_y',          # Origen vertical de los desplazamientos de `layout`
+    'precio',           # (x, y, ancho, alto) del recuadro del precio
+    'precio_base',      # Línea base del texto del precio
+    'barcode',          # (x, y, alto, escala_x) del código de barras
+    'patron',           # PatronBarcode del código de barras
+    'barcode_texto_y',  # Línea base del número legible del código
+])
+
 
 class Etiqueta:
     """Clase para generar etiquetas de ropa."""
-    
+
+    __slots__ = ('barcode_value', 'product_name', 'talla', 'precio', 'sku', 'image_path')
+
+    # Dimensiones compartidas por todas las etiquetas (ver GEOMETRIA_ETIQUETA)
+    geometria = GEOMETRIA_ETIQUETA
+    width = GEOMETRIA_ETIQUETA.ancho
+    height = GEOMETRIA_ETIQUETA.alto
+    margin = GEOMETRIA_ETIQUETA.margen
+    content_width = GEOMETRIA_ETIQUETA.ancho_util
+    v_spacing = GEOMETRIA_ETIQUETA.espacio_vertical
+
     def __init__(self, datos):
         """Inicializa los datos de la etiqueta.
         
         Args:
-            datos: Diccionario con los datos de la etiqueta
+            datos: Diccionario o excel_manager.DatosEtiqueta con los datos de la etiqueta
         """
         self.barcode_value = datos.get('barcode_value', '')
         self.product_name = datos.get('product_name', '')
@@ -21,18 +352,82 @@ class Etiqueta:
         self.precio = datos.get('precio', '')
         self.sku = datos.get('sku', '')
         self.image_path = datos.get('image_path', 'assets/logo.jpeg')
+    
+    def calcular_disposicion(self):
+        """Resuelve la posición de todos los elementos de la etiqueta.
 
-        # Dimensiones de la etiqueta: 50 x 38 mm
-        self.width = 50 * mm
-        self.height = 38 * mm
+        Returns:
+            DisposicionEtiqueta en puntos, con origen en la esquina inferior izquierda
+        """
+        # Insertar imagen (logo)
+        logo = None
+        try:
+            logo_cacheado = cargar_logo(self.image_path)
+            if logo_cacheado is not None:
+                # Ajustar ancho del logo al ancho de contenido
+                img_width, img_height = logo_cacheado.escalar(min(2.8 * cm, self.content_width))
+                img_x = self.margin + (self.content_width - img_width) / 2
+                img_y = self.height - img_height - self.margin
+                logo = (img_x, img_y, img_width, img_height)
+            else:
+                # Espacio para la imagen sin imagen real
+                img_height = 1.0 * cm  # Mayor espacio reservado
+                img_y = self.height - img_height - self.margin
+        except Exception as e:
+            print(f"Error al cargar imagen {self.image_path}: {e}")
+            img_height = 0.6 * cm
+            img_y = self.height - img_height - 0.1 * cm
+
+        # FIT - inmediatamente debajo del logo
+        text_y = img_y - self.v_spacing
+
+        # Pequeño separador dorado decorativo
+        sep_w = self.content_width * 0.6
+        sep_x = self.margin + (self.content_width - sep_w) / 2
+        separador = (sep_x, sep_x + sep_w, text_y + 0.2 * cm)
+        text_y -= 0.18 * cm
+
+        # Posiciones de texto ya resueltas (fuentes, cortes de línea y alturas)
+        layout = calcular_layout_texto(self.product_name, self.talla, self.precio,
+                                       self.content_width, self.v_spacing)
+
+        # Precio (en un cuadro más compacto pero visible)
+        price_box_width = layout.precio_ancho
+        price_x = self.margin + (self.content_width - price_box_width) / 2
+        rect_y = text_y + layout.precio_dy
+        rect_height = 0.5 * cm
+        rect_center_y = rect_y + (rect_height / 2.3)
+        font_offset = 2.5
+
+        # --- Código de barras (Code128) - Ocupando el espacio restante ---
+        espacio_disponible = rect_y - 0.3 * cm  # Espacio desde el precio hasta el borde inferior
+        bar_height = min(1.2 * cm, espacio_disponible * 0.85)  # Usar 85% del espacio disponible
+        target_w = self.width - 0.2 * cm  # Margen horizontal para el nuevo ancho
+
+        # Código de barras: patrón Code128 cacheado por valor, con módulos de 0.35 mm
+        patron = patron_code128(self.barcode_value)
+        barcode_width = ancho_barcode(patron)
+
+        # Posición vertical base del código (debajo del precio)
+        barcode_y = rect_y - 0.35 * cm - bar_height
+
+        # Escala horizontal para encajar en target_w, centrado horizontal
+        scale_x = min(1.0, target_w / barcode_width)
+        barcode_x = (self.width - barcode_width * scale_x) / 2.0
+
+        return DisposicionEtiqueta(
+            logo=logo,
+            separador=separador,
+            centro_x=self.margin + self.content_width / 2,
+            layout=layout,
+            texto_y=text_y,
+            precio=(price_x, rect_y, price_box_width, rect_height),
+            precio_base=rect_center_y - font_offset,
+            barcode=(barcode_x, barcode_y, bar_height, scale_x),
+            patron=patron,
+            barcode_texto_y=barcode_y - 0.2 * cm,
+        )
 
-        # Márgenes internos para evitar que algo se salga de los bordes
-        self.margin = 0.12 * cm
-        # Área disponible para contenido (ancho útil)
-        self.content_width = self.width - 2 * self.margin
-        # Espacio vertical reservado entre elementos
-        self.v_spacing = 0.12 * cm
-    
     def dibujar(self, c, x_offset=0, y_offset=0):
         """Dibuja la etiqueta en un objeto canvas en la posición especificada.
         
@@ -41,6 +436,10 @@ class Etiqueta:
             x_offset: Desplazamiento horizontal en puntos
             y_offset: Desplazamiento vertical en puntos
         """
+        disposicion = self.calcular_disposicion()
+        layout = disposicion.layout
+        text_y = disposicion.texto_y
+
         # Guardar el estado actual del canvas
         c.saveState()
 
@@ -57,164 +456,51 @@ class Etiqueta:
         # Dibujar fondo con esquinas redondeadas, sin trazo (solo fondo)
         c.roundRect(0, 0, self.width, self.height, 3 * mm, stroke=0, fill=1)
 
-        # Insertar imagen (logo)
-        try:
-            if os.path.exists(self.image_path):
-                img = Image.open(self.image_path)
-                # Ajustar ancho del logo al ancho de contenido
-                max_logo_width = min(2.8 * cm, self.content_width)
-                img_width = max_logo_width
-                img_height = img.size[1] * (img_width / img.size[0])
-                img_x = self.margin + (self.content_width - img_width) / 2
-                img_y = self.height - img_height - self.margin
-                c.drawImage(self.image_path, img_x, img_y, img_width, img_height, preserveAspectRatio=True, mask='auto')
-            else:
-                # Espacio para la imagen sin imagen real
-                img_height = 1.0 * cm  # Mayor espacio reservado
-                img_y = self.height - img_height - self.margin
-        except Exception as e:
-            print(f"Error al cargar imagen {self.image_path}: {e}")
-            img_height = 0.6 * cm
-            img_y = self.height - img_height - 0.1 * cm
-
-        # FIT - inmediatamente debajo del logo
-        text_y = img_y - self.v_spacing
+        if disposicion.logo is not None:
+            # La imagen ya codificada se registra una vez por PDF; drawImage la encuentra
+            # por la ruta y solo añade el dibujo
+            logo_cacheado = cargar_logo(self.image_path)
+            if logo_cacheado is not None:
+                logo_cacheado.incrustar(c)
+            c.drawImage(self.image_path, *disposicion.logo, preserveAspectRatio=True,
+                        mask=LogoCacheado.MASCARA)
 
         # Pequeño separador dorado decorativo
-        sep_w = self.content_width * 0.6
-        sep_x = self.margin + (self.content_width - sep_w) / 2
+        sep_x1, sep_x2, sep_y = disposicion.separador
         c.setStrokeColor(gold)
         c.setLineWidth(0.9)
-        c.line(sep_x, text_y + 0.2 * cm, sep_x + sep_w, text_y + 0.2 * cm)
-        text_y -= 0.18 * cm
+        c.line(sep_x1, sep_y, sep_x2, sep_y)
 
         # Nombre del producto (más grande y destacado) - estilo serif
-        # Ajustar tamaño de fuente o dividir en hasta 2 líneas para que quepa en content_width
-        max_font = 12
-        min_font = 8
-        font = max_font
-        # util: medida en puntos del string
-        while font >= min_font:
-            w = c.stringWidth(self.product_name, "Helvetica-Bold", font)
-            if w <= self.content_width:
-                # cabe en una sola línea
-                c.setFont("Times-Bold", font)
-                c.setFillColor(dark)
-                c.drawCentredString(self.margin + self.content_width / 2, text_y, self.product_name)
-                text_y -= (font / 72.0) * cm + self.v_spacing
-                break
-            else:
-                # probar dividir en dos líneas: buscar punto de corte por palabras
-                words = self.product_name.split()
-                for split_index in range(1, len(words)):
-                    first = ' '.join(words[:split_index])
-                    second = ' '.join(words[split_index:])
-                    w1 = c.stringWidth(first, "Helvetica-Bold", font)
-                    w2 = c.stringWidth(second, "Helvetica-Bold", font)
-                    if w1 <= self.content_width and w2 <= self.content_width:
-                        c.setFont("Times-Bold", font)
-                        c.setFillColor(dark)
-                        c.drawCentredString(self.margin + self.content_width / 2, text_y + (font * 0.35), first)
-                        c.drawCentredString(self.margin + self.content_width / 2, text_y - (font * 0.35), second)
-                        text_y -= (font / 72.0) * cm * 2 + self.v_spacing
-                        font = None
-                        break
-                if font is None:
-                    break
-            font -= 1
-        else:
-            # Si baja del min_font, cortar y mostrar primera parte con '...'
-            display = self.product_name
-            # recortar para que el ancho de display con min_font quepa
-            while c.stringWidth(display + '...', "Helvetica-Bold", min_font) > self.content_width and len(display) > 0:
-                display = display[:-1]
-            c.setFont("Times-Bold", min_font)
-            c.setFillColor(dark)
-            c.drawCentredString(self.margin + self.content_width / 2, text_y, display + '...')
-            text_y -= (min_font / 72.0) * cm + self.v_spacing
+        c.setFont("Times-Bold", layout.nombre_font)
+        c.setFillColor(dark)
+        for linea, dy in layout.nombre_lineas:
+            c.drawCentredString(disposicion.centro_x, text_y + dy, linea)
 
         # Talla (directamente debajo del nombre del producto)
-        talla_y = text_y - self.v_spacing
-
-        # Ajustar tamaño de fuente para la talla según ancho disponible
-        talla_font = 14
-        while talla_font > 8 and c.stringWidth(self.talla, "Helvetica-Bold", talla_font) > self.content_width:
-            talla_font -= 1
-        c.setFont("Helvetica-Bold", talla_font)
+        c.setFont("Helvetica-Bold", layout.talla_font)
         c.setFillColor(dark)
-        c.drawCentredString(self.margin + self.content_width / 2, talla_y, self.talla)
-        text_y = talla_y - (talla_font / 72.0) * cm - self.v_spacing
-
-        # Precio (en un cuadro más compacto pero visible)
-        precio_y = text_y - self.v_spacing
-        # Ajuste de fuente del precio
-        precio_font = 11
-        while precio_font > 6 and c.stringWidth(self.precio, "Helvetica-Bold", precio_font) > self.content_width - (0.3 * cm):
-            precio_font -= 1
-        c.setFont("Helvetica-Bold", precio_font)
-
-        # Calcular dimensiones del cuadro para el precio, no mayor que content_width
-        padding_px = 6  # puntos
-        price_box_width = min(self.content_width, c.stringWidth(self.precio, "Helvetica-Bold", precio_font) + padding_px)
-        price_box_height = 0.5 * cm
-        price_x = self.margin + (self.content_width - price_box_width) / 2
-
-        # Establece las posiciones del rectángulo
-        rect_y = precio_y - 0.05 * cm
-        rect_height = price_box_height
+        c.drawCentredString(disposicion.centro_x, text_y + layout.talla_dy, self.talla)
 
         # Dibuja un recuadro de precio estilo 'pill' con fondo negro y texto dorado
-        pill_x = price_x
-        pill_y = rect_y
-        pill_w = price_box_width
-        pill_h = rect_height
+        c.setFont("Helvetica-Bold", layout.precio_font)
         c.setFillColor(dark)
         c.setStrokeColor(gold)
         c.setLineWidth(0.6)
-        c.roundRect(pill_x, pill_y, pill_w, pill_h, 1.5 * mm, stroke=1, fill=1)
+        c.roundRect(*disposicion.precio, 1.5 * mm, stroke=1, fill=1)
 
         # Texto del precio en blanco sobre fondo oscuro (blanco/negro)
         c.setFillColor(colors.white)
-        rect_center_y = pill_y + (pill_h / 2.3)
-        font_offset = 2.5
-        c.drawCentredString(self.margin + self.content_width / 2, rect_center_y - font_offset, self.precio)
-
-        target_w = self.content_width
-        bar_height = 0.75 * cm
-
-        # --- Código de barras (Code128) - Ocupando el espacio restante ---
-        espacio_disponible = rect_y - 0.3 * cm  # Espacio desde el precio hasta el borde inferior
-        bar_height = min(1.2 * cm, espacio_disponible * 0.85)  # Usar 85% del espacio disponible
-        target_w = self.width - 0.2 * cm  # Margen horizontal para el nuevo ancho
-
-        # Código de barras: restaurado al estilo funcional original
-        barcode = code128.Code128(
-            self.barcode_value,
-            barHeight=bar_height,
-            barWidth=0.35 * mm,
-            humanReadable=False
-        )
-
-        # Posición vertical base del código (debajo del precio)
-        barcode_y = rect_y - 0.35 * cm - bar_height
-
-        # Escala horizontal para encajar en target_w
-        scale_x = min(1.0, target_w / barcode.width)
+        c.drawCentredString(disposicion.centro_x, disposicion.precio_base, self.precio)
 
-        # Centrado horizontal y dibujo del barcode escalado
-        c.saveState()
-        barcode_x = (self.width - barcode.width * scale_x) / 2.0
-        c.translate(barcode_x, barcode_y)
-        c.scale(scale_x, 1.0)
-        barcode.drawOn(c, 0, 0)
-        c.restoreState()
+        # Código de barras escalado y centrado, en negro sobre el fondo
+        c.setFillColor(dark)
+        dibujar_barcode(c, disposicion.patron, *disposicion.barcode)
 
         # Número del código de barras debajo del código (legible)
         c.setFont("Helvetica", 6.5)
         c.setFillColor(dark)
-        c.drawCentredString(self.width / 2, barcode_y - 0.2 * cm, self.barcode_value)
+        c.drawCentredString(self.width / 2, disposicion.barcode_texto_y, self.barcode_value)
 
         # Restaurar el estado del canvas
         c.restoreState()
-
-
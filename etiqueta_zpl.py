@@ -0,0 +1,201 @@
+"""Salida de etiquetas en ZPL, el lenguaje de las impresoras térmicas Zebra.
+
+Usa la misma disposición que el PDF (Etiqueta.calcular_disposicion): logo, nombre con
+las mismas reglas de ajuste, talla, recuadro del precio y código Code128. El logo se
+envía una sola vez como gráfico almacenado en la impresora y cada producto se envía
+una vez con su número de copias (^PQ), en lugar de repetir una página por etiqueta.
+"""
+import os
+from reportlab.lib.units import mm
+from etiqueta_pdf import Etiqueta, ANCHO_MODULO_BARCODE
+import instrumentacion
+
+# Resolución por defecto de las impresoras (8 puntos por mm)
+DPI_PREDETERMINADO = 203
+
+# Radio de las esquinas del recuadro del precio en el PDF
+RADIO_PRECIO = 1.5 * mm
+
+# Tamaño del número legible bajo el código de barras, en puntos
+FUENTE_NUMERO = 6.5
+
+
+def _escapar(texto):
+    """Escapa un texto para ^FD con ^FH: '_', '^' y '~' se envían en hexadecimal."""
+    return str(texto).replace('_', '_5F').replace('^', '_5E').replace('~', '_7E')
+
+
+def grafico_zpl(path, ancho, alto, nombre):
+    """Convierte una imagen en el comando ~DG que la guarda en la memoria de la impresora.
+
+    Args:
+        path: Ruta de la imagen
+        ancho, alto: Tamaño en puntos de la impresora (dots) al que se escala
+        nombre: Nombre del gráfico en la impresora (por ejemplo, 'R:LOGO1.GRF')
+
+    Returns:
+        String con el comando ~DG
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(path) as imagen:
+        imagen = imagen.convert('RGBA')
+        # Las zonas transparentes quedan en blanco, igual que con mask='auto' en el PDF
+        fondo = Image.new('RGBA', imagen.size, (255, 255, 255, 255))
+        gris = Image.alpha_composite(fondo, imagen).convert('L').resize((ancho, alto), Image.LANCZOS)
+    # En el formato GRF un bit a 1 es un punto negro: invertir y umbralizar
+    bits = ImageOps.invert(gris).point(lambda valor: 255 if valor >= 128 else 0).convert('1')
+    datos = bits.tobytes()
+    bytes_fila = (ancho + 7) // 8
+    return f"~DG{nombre},{len(datos)},{bytes_fila},{datos.hex().upper()}\n"
+
+
+class GeneradorZPL:
+    """Genera un archivo o flujo ZPL con una orden de impresión por producto."""
+
+    def __init__(self, output_file="etiquetas.zpl", dpi=DPI_PREDETERMINADO):
+        """Inicializa el generador ZPL.
+
+        Args:
+            output_file: Ruta del archivo a generar u objeto binario con write()
+                (por ejemplo, io.BytesIO o el socket de la impresora)
+            dpi: Resolución de la impresora en puntos por pulgada (203, 300 o 600)
+        """
+        self.output_file = output_file
+        self.dpi = dpi
+        self._graficos = {}  # (ruta, ancho, alto) -> nombre del gráfico en la impresora
+
+    def _dots(self, puntos):
+        """Convierte puntos PDF (1/72 de pulgada) en puntos de la impresora."""
+        return int(round(puntos * self.dpi / 72.0))
+
+    def _grafico(self, salida, path, ancho, alto):
+        """Devuelve el nombre del gráfico del logo, enviándolo antes si es la primera vez."""
+        clave = (os.path.abspath(path), ancho, alto)
+        nombre = self._graficos.get(clave)
+        if nombre is None:
+            nombre = f"R:LOGO{len(self._graficos) + 1}.GRF"
+            salida.write(grafico_zpl(path, ancho, alto, nombre).encode('ascii'))
+            self._graficos[clave] = nombre
+        return nombre
+
+    def _texto(self, x, base, ancho, puntos, texto, invertido=False):
+        """Campo de texto centrado en un bloque de `ancho` con la línea base en `base`."""
+        alto = self._dots(puntos)
+        return (f"^FT{x},{base}^A0N,{alto}^FB{ancho},1,0,C{'^FR' if invertido else ''}"
+                f"^FH^FD{_escapar(texto)}^FS")
+
+    def orden_etiqueta(self, salida, datos, copias):
+        """Construye la orden ZPL (^XA...^XZ) de un producto con su número de copias.
+
+        Args:
+            salida: Flujo binario donde se envían antes los gráficos que falten
+            datos: Diccionario con los datos de la etiqueta
+            copias: Número de etiquetas a imprimir
+
+        Returns:
+            String con la orden ZPL
+        """
+        etiqueta = Etiqueta(datos)
+        disposicion = etiqueta.calcular_disposicion()
+        layout = disposicion.layout
+        alto_total = etiqueta.height
+        dots = self._dots
+
+        def arriba(y, alto=0):
+            # El origen de ZPL es la esquina superior izquierda
+            return dots(alto_total - y - alto)
+
+        ancho_dots = dots(etiqueta.width)
+        margen = dots(etiqueta.margin)
+        ancho_util = dots(etiqueta.content_width)
+        campos = [f"^XA^CI28^PW{ancho_dots}^LL{dots(alto_total)}^LH0,0"]
+
+        if disposicion.logo is not None:
+            x, y, ancho, alto = disposicion.logo
+            nombre = self._grafico(salida, etiqueta.image_path, dots(ancho), dots(alto))
+            campos.append(f"^FO{dots(x)},{arriba(y, alto)}^XG{nombre},1,1^FS")
+
+        x1, x2, y = disposicion.separador
+        grosor = max(1, dots(0.9))
+        campos.append(f"^FO{dots(x1)},{arriba(y) - grosor // 2}^GB{dots(x2 - x1)},{grosor},{grosor}^FS")
+
+        for linea, dy in layout.nombre_lineas:
+            campos.append(self._texto(margen, arriba(disposicion.texto_y + dy), ancho_util,
+                                      layout.nombre_font, linea))
+        campos.append(self._texto(margen, arriba(disposicion.texto_y + layout.talla_dy), ancho_util,
+                                  layout.talla_font, etiqueta.talla))
+
+        # Recuadro del precio relleno con el texto en blanco (^FR invierte sobre el negro)
+        x, y, ancho, alto = disposicion.precio
+        ancho_precio, alto_precio = dots(ancho), dots(alto)
+        redondeo = min(8, int(round(RADIO_PRECIO * 16 / min(ancho, alto))))
+        campos.append(f"^FO{dots(x)},{arriba(y, alto)}^GB{ancho_precio},{alto_precio},{alto_precio},B,{redondeo}^FS")
+        campos.append(self._texto(margen, arriba(disposicion.precio_base), ancho_util,
+                                  layout.precio_font, etiqueta.precio, invertido=True))
+
+        # Code128 nativo de la impresora, con el módulo entero más cercano al del PDF
+        x, y, alto, escala = disposicion.barcode
+        patron = disposicion.patron
+        modulo = max(1, int(ANCHO_MODULO_BARCODE * escala * self.dpi / 72.0))
+        while modulo > 1 and patron.modulos * modulo > ancho_dots:
+            modulo -= 1
+        x_barras = max(0, (ancho_dots - patron.modulos * modulo) // 2)
+
+        # En el PDF la línea base del número queda bajo el borde inferior; aquí se
+        # mantiene dentro de la etiqueta, acortando las barras si hace falta
+        base_numero = min(arriba(disposicion.barcode_texto_y), dots(alto_total) - 2)
+        y_barras = arriba(y, alto)
+        alto_barras = max(1, min(dots(alto), base_numero - dots(FUENTE_NUMERO) - y_barras))
+        campos.append(f"^FO{x_barras},{y_barras}^BY{modulo}^BCN,{alto_barras},N,N,N,A"
+                      f"^FD{_escapar(etiqueta.barcode_value)}^FS")
+        campos.append(self._texto(0, base_numero, ancho_dots, FUENTE_NUMERO, etiqueta.barcode_value))
+
+        campos.append(f"^PQ{copias}^XZ")
+        return "\n".join(campos) + "\n"
+
+    def generar_zpl(self, datos_etiquetas):
+        """Genera el ZPL con una etiqueta por diccionario de datos.
+
+        Args:
+            datos_etiquetas: Iterable de diccionarios con los datos de cada etiqueta
+
+        Returns:
+            int: Número de etiquetas generadas
+        """
+        return self.generar_zpl_grupos((datos, 1) for datos in datos_etiquetas)
+
+    def generar_zpl_grupos(self, grupos_etiquetas):
+        """Genera el ZPL a partir de grupos (datos, copias), una orden por producto.
+
+        Args:
+            grupos_etiquetas: Iterable de tuplas (datos_etiqueta, copias)
+
+        Returns:
+            int: Número de etiquetas generadas
+        """
+        es_ruta = isinstance(self.output_file, str)
+        salida = open(self.output_file, "wb") if es_ruta else self.output_file
+        total = 0
+        productos = 0
+        try:
+            with instrumentacion.etapa('generar_zpl'):
+                for datos, copias in grupos_etiquetas:
+                    if copias <= 0:
+                        continue
+                    salida.write(self.orden_etiqueta(salida, datos, copias).encode('utf-8'))
+                    total += copias
+                    productos += 1
+        finally:
+            if es_ruta:
+                salida.close()
+        instrumentacion.contar('paginas_dibujadas', total)
+        if es_ruta:
+            instrumentacion.contar('bytes_escritos', os.path.getsize(self.output_file))
+
+        if total == 0:
+            print("[AVISO] No se proporcionaron etiquetas para generar")
+        destino = self.output_file if es_ruta else "flujo de salida"
+        print(f"[OK] ZPL generado: {destino} con {total} etiquetas ({productos} órdenes de impresión)")
+        return total
+
@@ -1,26 +1,271 @@
 import pandas as pd
+import numpy as np
+import csv
 import os
 import random
+import shutil
 import hashlib
+import sys
+import tempfile
+import zipfile
+from collections import namedtuple
+import instrumentacion
+from tuberia import en_hilo, CAPACIDAD_PREDETERMINADA
+from xlsx_rapido import actualizar_columna_xlsx, leer_filas_xlsx, FormatoNoSoportado
+
+# Columnas del Excel que usa el proceso de etiquetas
+COLUMNAS_ETIQUETA = ('SKU', 'Stock', 'Código Barras', 'Nombre Etiqueta', 'Nombre Producto/Servicio',
+                     'Variante', 'Precio handtag')
+
+# Tipos explícitos de las columnas de texto, para no depender de la inferencia de pandas
+TIPOS_COLUMNAS = {
+    'SKU': str,
+    'Código Barras': str,
+    'Nombre Etiqueta': str,
+    'Nombre Producto/Servicio': str,
+    'Variante': str,
+    'Precio handtag': 'float64',
+}
+
+# Carpeta por defecto de las copias binarias de los Excel ya leídos
+DIRECTORIO_CACHE = "output/.cache_excel"
+
+# Campos de los datos de cada etiqueta, en el orden en que se construyen
+CAMPOS_ETIQUETA = ('product_name', 'talla', 'precio', 'sku', 'barcode_value', 'image_path')
+
+# Campos cuyos textos se repiten entre productos (tallas, precios, nombres por talla)
+CAMPOS_REPETIDOS = ('product_name', 'talla', 'precio', 'image_path')
+
+_CAMPOS = frozenset(CAMPOS_ETIQUETA)
+
+# Filas por lote al leer y preparar el archivo en tubería (ver iterar_grupos_tuberia)
+TAMANIO_LOTE = 2000
+
+# Patrón de los textos que int() acepta como stock válido
+_PATRON_ENTERO = r'\s*[+-]?\d+\s*'
+
+
+class DatosEtiqueta(namedtuple('DatosEtiqueta', CAMPOS_ETIQUETA)):
+    """Datos de una etiqueta: tupla con nombre, inmutable y sin diccionario por instancia.
+
+    Ocupa una fracción de un diccionario con las mismas claves y, al ser inmutable, todas
+    las copias de un producto comparten el mismo registro. Admite get() como los
+    diccionarios de datos, por lo que Etiqueta y los generadores aceptan ambos.
+    """
+
+    __slots__ = ()
+
+    def get(self, campo, defecto=None):
+        """Devuelve el valor de un campo, o `defecto` si la etiqueta no tiene ese campo."""
+        return getattr(self, campo) if campo in _CAMPOS else defecto
+
+
+def _columna(data, nombre, defecto=''):
+    """Devuelve una columna del DataFrame o una Serie con el valor por defecto si no existe."""
+    if nombre in data.columns:
+        return data[nombre]
+    return pd.Series(defecto, index=data.index, dtype=object)
+
+
+def _como_texto(columna):
+    """Convierte una columna a texto con la misma representación que str() por valor."""
+    return columna.astype(str).fillna('nan')
+
+
+def _convertir_stock(columna):
+    """Convierte una columna de stock a enteros con la misma semántica que int() por valor.
+
+    Returns:
+        Tupla (stock, invalidos) con la Serie de enteros (0 en los valores no válidos)
+        y la máscara booleana de los valores que no se pudieron convertir
+    """
+    numeros = pd.to_numeric(columna, errors='coerce')
+    if not pd.api.types.is_numeric_dtype(columna):
+        # int() no acepta textos con decimales como '5.0', solo enteros
+        es_texto = columna.map(lambda valor: isinstance(valor, str)).astype(bool)
+        no_entero = pd.Series(False, index=columna.index)
+        no_entero[es_texto] = ~columna[es_texto].astype(str).str.fullmatch(_PATRON_ENTERO).astype(bool)
+        numeros = numeros.mask(no_entero)
+    invalidos = numeros.isna()
+    # int() trunca los decimales hacia cero
+    stock = np.trunc(numeros.fillna(0).astype('float64')).astype('int64')
+    return stock, invalidos
+
+
+def _formatear_precios(columna):
+    """Formatea los precios como 'S/ 0.00', calculando cada valor distinto una sola vez."""
+    codigos, unicos = pd.factorize(columna, use_na_sentinel=False)
+    textos = [f"S/ {valor:.2f}" for valor in unicos]
+    return pd.Series(textos, dtype=object).take(codigos).set_axis(columna.index)
+
+
+def _leer_tabla(path, columnas=None, hoja=None):
+    """Lee un archivo Excel o CSV con pandas.
+
+    Args:
+        path: Ruta al archivo (.xlsx/.xls o .csv)
+        columnas: Nombres de las columnas a leer (None para leerlas todas)
+        hoja: Hoja del Excel (nombre, posición o None para la primera); se ignora en CSV
+
+    Returns:
+        DataFrame con los datos leídos
+    """
+    opciones = {}
+    if columnas is not None:
+        opciones['usecols'] = lambda nombre: nombre in columnas
+        opciones['dtype'] = {nombre: tipo for nombre, tipo in TIPOS_COLUMNAS.items() if nombre in columnas}
+    if path.lower().endswith('.csv'):
+        # utf-8-sig acepta también los CSV exportados por Excel con BOM
+        return pd.read_csv(path, encoding='utf-8-sig', **opciones)
+    return pd.read_excel(path, sheet_name=0 if hoja is None else hoja, **opciones)
+
+
+def _tipar_lote(filas, encabezados, inicio):
+    """Construye el DataFrame de un lote de filas leídas con xlsx_rapido.
+
+    Las columnas de texto y el precio se convierten con TIPOS_COLUMNAS, igual que al leer
+    el libro entero con pandas, y el índice es la posición de cada fila en la hoja.
+    """
+    indice = pd.RangeIndex(inicio, inicio + len(filas))
+    # Columnas de objetos: inferir el tipo aquí convertiría a 123.0 los códigos de una
+    # columna con celdas vacías antes de pasarlos a texto
+    lote = pd.DataFrame({nombre: pd.Series([fila.get(nombre, np.nan) for fila in filas], index=indice, dtype=object)
+                         for nombre in dict.fromkeys(encabezados) if nombre in COLUMNAS_ETIQUETA},
+                        index=indice)
+    return lote.astype({nombre: tipo for nombre, tipo in TIPOS_COLUMNAS.items() if nombre in lote.columns})
+
+
+def _internar(valores):
+    """Hace que los textos iguales de una columna compartan un único objeto en memoria."""
+    return [sys.intern(valor) if type(valor) is str else valor for valor in valores]
+
+
+def _grupos(preparado):
+    """Recorre los datos preparados como grupos (DatosEtiqueta, copias) de los productos con stock."""
+    columnas = [_internar(preparado[campo].tolist()) if campo in CAMPOS_REPETIDOS else preparado[campo].tolist()
+                for campo in CAMPOS_ETIQUETA]
+    crear = DatosEtiqueta._make
+    for valores, copias in zip(zip(*columnas), preparado['copias'].tolist()):
+        yield crear(valores), copias
+
+
+def _codigos_como_numero(columna):
+    """Convierte a número los códigos de barras leídos como texto que solo tienen dígitos,
+    para que se guarden en el Excel como celdas numéricas igual que los originales."""
+    columna = columna.astype(object)
+    digitos = columna.map(lambda valor: isinstance(valor, str) and valor.isdigit()).astype(bool)
+    return columna.mask(digitos, columna[digitos].map(int))
+
+
+def _codigo_barras(sku_str, generador):
+    """Calcula el código de barras de un SKU ya normalizado con un generador aleatorio privado."""
+    # Generar un hash MD5 basado en el SKU
+    hash_hex = hashlib.md5(sku_str.encode()).hexdigest()
+
+    # Convertir parte del hash hexadecimal a un número
+    hash_num = int(hash_hex[:8], 16)
+
+    # Añadir un factor aleatorio pero consistente para el mismo SKU.
+    # Sembrar un generador propio con el SKU da la misma secuencia que
+    # random.seed(sku) sin alterar el estado global del módulo random
+    generador.seed(sku_str)
+    random_factor = generador.randint(1000, 9999)
+
+    # Combinar el hash del SKU con el factor aleatorio para generar un código de barras
+    combined_num = (hash_num + random_factor) % 999999999999  # 12 dígitos máximo
+
+    # Asegurarnos de que el primer dígito no sea cero (1-9); el resto con 11 dígitos
+    return "6" + str(combined_num).zfill(11)[-11:]
+
+
+def generar_codigos_barras(skus):
+    """Genera los códigos de barras de una secuencia de SKU.
+
+    Usa un generador aleatorio propio por llamada, por lo que no toca el módulo
+    random global y se puede llamar desde varios hilos o procesos a la vez.
+    Los SKU repetidos se calculan una sola vez.
+
+    Args:
+        skus: Iterable (lista, Serie, columna) con los SKU de los productos
+
+    Returns:
+        Lista de strings con el código de barras de 12 dígitos de cada SKU
+    """
+    generador = random.Random()
+    calculados = {}
+    codigos = []
+    for sku in skus:
+        # Asegurarse de que el SKU sea un string
+        sku_str = str(sku).strip()
+        codigo = calculados.get(sku_str)
+        if codigo is None:
+            codigo = calculados[sku_str] = _codigo_barras(sku_str, generador)
+        codigos.append(codigo)
+    instrumentacion.contar('codigos_generados', len(calculados))
+    return codigos
+
 
 class ExcelManager:
     """Clase para manejar la importación y procesamiento de datos desde Excel."""
     
-    def __init__(self, file_path=None):
+    def __init__(self, file_path=None, cache_dir=DIRECTORIO_CACHE, registro=None):
         """Inicializa el manejador de Excel.
         
         Args:
-            file_path: Ruta al archivo Excel a procesar
+            file_path: Ruta al archivo Excel (o CSV) a procesar
+            cache_dir: Carpeta para las copias binarias de los archivos ya leídos
+                (None para desactivarlas)
+            registro: Registro persistente de códigos de barras (opcional, ver
+                registro_codigos.RegistroCodigos); si se indica, los códigos del libro
+                se registran y los que falten se toman de él o se emiten sin colisiones
         """
         self.file_path = file_path
+        self.cache_dir = cache_dir
+        self.registro = registro
         self.data = None
         self.codigos_actualizados = False
+        self.codigos_nuevos = {}  # Índice de fila -> código generado, pendientes de guardar
+        self.columnas_parciales = False
+        self.hoja = None  # Hoja del Excel leída (None = la primera)
+        self.seleccion = None  # Máscara de los productos para los que se generan etiquetas
     
-    def cargar_excel(self, file_path=None):
-        """Carga los datos desde un archivo Excel.
+    def _ruta_cache(self, solo_columnas_etiqueta):
+        """Devuelve la ruta de la copia binaria del archivo actual y el prefijo de sus versiones.
+
+        La clave incluye la ruta, el tamaño y la fecha de modificación del archivo, por lo
+        que cualquier cambio en el Excel invalida la copia.
+        """
+        stat = os.stat(self.file_path)
+        ruta = os.path.abspath(self.file_path)
+        prefijo = hashlib.sha1(ruta.encode('utf-8')).hexdigest()[:16]
+        clave = f"{stat.st_size}:{stat.st_mtime_ns}:{int(solo_columnas_etiqueta)}:{self.hoja!r}"
+        version = hashlib.sha1(clave.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{prefijo}_{version}.pkl"), prefijo
+
+    def _guardar_cache(self, ruta_cache, prefijo):
+        """Guarda la copia binaria de los datos y elimina las versiones anteriores del mismo archivo."""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            for nombre in os.listdir(self.cache_dir):
+                if nombre.startswith(prefijo + "_"):
+                    os.remove(os.path.join(self.cache_dir, nombre))
+            temporal = ruta_cache + ".tmp"
+            self.data.to_pickle(temporal)
+            os.replace(temporal, ruta_cache)
+        except OSError as e:
+            print(f"[AVISO] No se pudo guardar la copia en caché del Excel: {e}")
+
+    def cargar_excel(self, file_path=None, solo_columnas_etiqueta=True, hoja=None):
+        """Carga los datos desde un archivo Excel o CSV.
+
+        Si el archivo no cambió desde la última lectura, se carga su copia binaria
+        en caché en lugar de volver a interpretar el Excel.
         
         Args:
-            file_path: Ruta al archivo Excel (opcional si ya se proporcionó en __init__)
+            file_path: Ruta al archivo Excel o CSV (opcional si ya se proporcionó en __init__)
+            solo_columnas_etiqueta: Si es True, lee solo las columnas que usan las etiquetas
+                (COLUMNAS_ETIQUETA); guardar_excel conserva igualmente el resto del archivo
+            hoja: Hoja del Excel a leer (nombre, posición empezando en 0 o None para la primera)
             
         Returns:
             DataFrame con los datos cargados
@@ -34,10 +279,29 @@ class ExcelManager:
         if not os.path.exists(self.file_path):
             raise FileNotFoundError(f"El archivo Excel no existe en la ruta: {self.file_path}")
             
+        self.codigos_actualizados = False
+        self.codigos_nuevos = {}
+        self.columnas_parciales = solo_columnas_etiqueta
+        self.hoja = hoja
+        self.seleccion = None
+        columnas = COLUMNAS_ETIQUETA if solo_columnas_etiqueta else None
+
         try:
-            # Leer el archivo Excel, asumiendo que la primera fila son encabezados
-            self.data = pd.read_excel(self.file_path)
-            print(self.data.head())  # Mostrar las primeras filas para verificar la carga
+            with instrumentacion.etapa('cargar_excel'):
+                if self.cache_dir:
+                    ruta_cache, prefijo = self._ruta_cache(solo_columnas_etiqueta)
+                    if os.path.exists(ruta_cache):
+                        self.data = pd.read_pickle(ruta_cache)
+                        instrumentacion.contar('filas_leidas', len(self.data))
+                        instrumentacion.contar('lecturas_desde_cache')
+                        print(f"[OK] Archivo Excel cargado desde caché con {len(self.data)} productos")
+                        return self.data
+
+                # Leer el archivo, asumiendo que la primera fila son encabezados
+                self.data = _leer_tabla(self.file_path, columnas, hoja)
+                if self.cache_dir:
+                    self._guardar_cache(ruta_cache, prefijo)
+            instrumentacion.contar('filas_leidas', len(self.data))
             print(f"[OK] Archivo Excel cargado correctamente con {len(self.data)} productos")
             return self.data
         except Exception as e:
@@ -53,104 +317,308 @@ class ExcelManager:
         Returns:
             String con el código de barras numérico que nunca comienza con cero
         """
-        # Asegurarse de que el SKU sea un string
-        sku_str = str(sku).strip()
-        
-        # Generar un hash MD5 basado en el SKU
-        hash_object = hashlib.md5(sku_str.encode())
-        hash_hex = hash_object.hexdigest()
-        
-        # Convertir parte del hash hexadecimal a un número
-        hash_num = int(hash_hex[:8], 16)
-        
-        # Añadir un factor aleatorio pero consistente para el mismo SKU
-        # Usamos el mismo SKU como semilla para el generador aleatorio
-        random.seed(sku_str)
-        random_factor = random.randint(1000, 9999)
-        
-        # Restaurar la semilla global después de usarla localmente
-        random.seed()
-        
-        # Combinar el hash del SKU con el factor aleatorio para generar un código de barras
-        combined_num = (hash_num + random_factor) % 999999999999  # 12 dígitos máximo
-        
-        # Asegurarnos de que el primer dígito no sea cero (1-9)
-        first_digit = 6
-        
-        # Formatear el resto para que tenga 11 dígitos (total 12 con el primer dígito)
-        rest_digits = str(combined_num).zfill(11)[-11:]
-        
-        # Combinar el primer dígito con el resto
-        barcode = str(first_digit) + rest_digits
-        
-        return barcode
-    
-    def generar_datos_etiquetas(self):
-        """Genera los datos para las etiquetas, replicando cada producto según su stock.
-        También actualiza los códigos de barras en el DataFrame original.
-        
+        return generar_codigos_barras([sku])[0]
+
+    def generar_barcodes(self, skus):
+        """Genera en bloque los códigos de barras de varios SKU.
+
+        Args:
+            skus: Iterable (lista, Serie, columna) con los SKU de los productos
+
+        Returns:
+            Lista de strings con el código de barras de cada SKU, en el mismo orden
+        """
+        return generar_codigos_barras(skus)
+
+    def seleccionar(self, skus=None, filas=None):
+        """Limita las etiquetas a algunos productos; el resto del archivo no se modifica.
+
+        Args:
+            skus: Conjunto de SKU a incluir (None para no filtrar por SKU)
+            filas: Tupla (primera, última) con los números de producto a incluir,
+                empezando en 1 (None para no filtrar por posición)
+
         Returns:
-            Lista de diccionarios con los datos para generar las etiquetas
+            int: Número de productos seleccionados
         """
         if self.data is None:
             raise ValueError("Primero debe cargar los datos con el método cargar_excel()")
-            
-        datos_etiquetas = []
-        total_etiquetas = 0
-        codigos_nuevos = {}  # Para registrar nuevos códigos generados
-        
-        # Iterar por cada fila (producto) en el DataFrame
-        for indice, row in self.data.iterrows():
-            # Obtener el stock del producto (asumiendo que es un entero positivo)
-            stock = row.get('Stock', 0)
-            try:
-                stock = int(stock)
-            except (ValueError, TypeError):
-                print(f"[AVISO] Advertencia: Stock no válido para {row.get('Nombre Producto/Servicio', '')}, utilizando 0")
-                stock = 0
-            
-            # Obtener el SKU
-            sku = str(row.get('SKU', ''))
-            
-            # Generar un único código de barras para este producto
-            # Si ya tiene un código de barras, usarlo; si no, generarlo basado en el SKU
-            barcode = str(row.get('Código Barras', '')).strip()
-            codigo_generado = False
-            
-            if not barcode or barcode.lower() == 'nan':
-                barcode = self.generar_barcode(sku)
-                codigo_generado = True
-                codigos_nuevos[indice] = barcode  # Guardar para actualizar después
-            
-            # Para cada unidad en stock, crear una etiqueta con el mismo código de barras
-            for _ in range(max(0, stock)):
-                etiqueta_data = {
-                    'product_name': row.get('Nombre Etiqueta', '') or row.get('Nombre Producto/Servicio', ''),
-                    'talla': row.get('Variante', ''),
-                    'tamanio': row.get('Tamanio', ''),
-                    'posicion': row.get('Posicion', ''),
-                    'fit': row.get('Fit', ''),
-                    'precio': f"S/ {row.get('Precio handtag', 0):.2f}",
-                    'sku': sku,
-                    'barcode_value': barcode,
-                    'image_path': 'assets/logo.jpeg'  # Ruta fija al logo
-                }
-                datos_etiquetas.append(etiqueta_data)
-            
-            total_etiquetas += stock
-        
-        # Actualizar los códigos de barras nuevos en el DataFrame
-        if codigos_nuevos:
-            for indice, codigo in codigos_nuevos.items():
-                self.data.at[indice, 'Código Barras'] = codigo
+
+        seleccion = pd.Series(True, index=self.data.index)
+        if filas is not None:
+            posicion = pd.Series(range(1, len(self.data) + 1), index=self.data.index)
+            seleccion &= posicion.between(filas[0], filas[1])
+        if skus is not None:
+            seleccion &= _como_texto(_columna(self.data, 'SKU')).isin(skus)
+        self.seleccion = seleccion
+        return int(seleccion.sum())
+
+    def preparar_datos_etiquetas(self):
+        """Prepara los datos de las etiquetas por columnas completas en lugar de fila a fila.
+        Convierte el stock, resuelve el nombre a mostrar, formatea el precio y genera en
+        bloque los códigos de barras que falten, actualizándolos en el DataFrame original.
+
+        Returns:
+            DataFrame con una fila por producto, las columnas de CAMPOS_ETIQUETA y la
+            columna 'copias' con el número de etiquetas a imprimir
+        """
+        if self.data is None:
+            raise ValueError("Primero debe cargar los datos con el método cargar_excel()")
+
+        with instrumentacion.etapa('preparar_datos'):
+            return self._preparar_datos_etiquetas()
+
+    def _preparar_datos_etiquetas(self, data=None, informar=True):
+        """Implementación de preparar_datos_etiquetas() (ver su documentación).
+
+        Args:
+            data: Filas a preparar (por defecto, las seleccionadas de self.data)
+            informar: Si es True, muestra cuántos códigos de barras se generaron
+        """
+        if data is None:
+            data = self.data if self.seleccion is None else self.data[self.seleccion]
+
+        # Stock como entero; los valores no válidos cuentan como 0
+        stock, invalidos = _convertir_stock(_columna(data, 'Stock', 0))
+        if invalidos.any():
+            nombres = _columna(data, 'Nombre Producto/Servicio')[invalidos]
+            for nombre in nombres:
+                print(f"[AVISO] Advertencia: Stock no válido para {nombre}, utilizando 0")
+
+        sku = _como_texto(_columna(data, 'SKU'))
+
+        # Si ya tiene un código de barras, usarlo; si no, generarlo basado en el SKU
+        codigos = _columna(data, 'Código Barras')
+        barcode = _como_texto(codigos)
+        if not pd.api.types.is_numeric_dtype(codigos):
+            # Los valores numéricos no pueden tener espacios alrededor
+            barcode = barcode.str.strip()
+        faltantes = (barcode == '') | (barcode.str.lower() == 'nan')
+        if self.registro is not None:
+            self._registrar_codigos(sku[~faltantes], barcode[~faltantes])
+        if faltantes.any():
+            if self.registro is not None:
+                nuevos = self.registro.asignar(sku[faltantes], origen=self.file_path)
+            else:
+                nuevos = self.generar_barcodes(sku[faltantes])
+            barcode = barcode.astype(object)
+            barcode[faltantes] = nuevos
+
+            # Actualizar en bloque los nuevos códigos en el DataFrame original (al leer
+            # por lotes no hay DataFrame completo: basta con anotarlos por posición)
+            indices = data.index[faltantes]
+            if self.data is not None:
+                if 'Código Barras' in self.data.columns:
+                    self.data['Código Barras'] = self.data['Código Barras'].astype(object)
+                else:
+                    self.data['Código Barras'] = pd.Series(float('nan'), index=self.data.index, dtype=object)
+                self.data.loc[indices, 'Código Barras'] = nuevos
+            self.codigos_nuevos.update(zip(indices, nuevos))
             self.codigos_actualizados = True
-            print(f"[OK] Se generaron {len(codigos_nuevos)} nuevos códigos de barras")
+            if informar:
+                print(f"[OK] Se generaron {len(nuevos)} nuevos códigos de barras")
+
+        # Nombre de la etiqueta, o el del producto cuando está vacío (las celdas vacías
+        # del Excel llegan como NaN, que no se pueden dibujar)
+        nombre = _columna(data, 'Nombre Etiqueta').astype(object)
+        nombre = nombre.mask(nombre.isna() | (nombre == ''), _columna(data, 'Nombre Producto/Servicio').astype(object))
+        nombre = nombre.fillna('')
+
+        return pd.DataFrame({
+            'product_name': nombre,
+            'talla': _columna(data, 'Variante').astype(object).fillna(''),
+            'precio': _formatear_precios(_columna(data, 'Precio handtag', 0)),
+            'sku': sku.astype(object),
+            'barcode_value': barcode.astype(object),
+            'image_path': 'assets/logo.jpeg',  # Ruta fija al logo
+            'copias': stock.clip(lower=0),
+        }, index=data.index)
+
+    def _registrar_codigos(self, skus, codigos, max_avisos=20):
+        """Registra los códigos que ya tiene el libro y avisa de las colisiones."""
+        colisiones = self.registro.registrar_existentes(zip(skus, codigos), origen=self.file_path)
+        for sku, codigo, otro in colisiones[:max_avisos]:
+            print(f"[AVISO] El código {codigo} del SKU {sku} ya está asignado al SKU {otro}")
+        if len(colisiones) > max_avisos:
+            print(f"[AVISO] ... y {len(colisiones) - max_avisos} códigos repetidos más")
+
+    def iterar_grupos_etiquetas(self):
+        """Recorre los productos de forma perezosa, emitiendo cada etiqueta una vez junto
+        con el número de copias que le corresponden según su stock.
+        Los códigos de barras que falten se generan y actualizan en el DataFrame original
+        antes de emitir la primera etiqueta.
+
+        Yields:
+            Tuplas (datos_etiqueta, copias) con los DatosEtiqueta del producto y la
+            cantidad de copias a imprimir
+        """
+        preparado = self.preparar_datos_etiquetas()
+        preparado = preparado[preparado['copias'] > 0]
+        yield from _grupos(preparado)
+
+        etiquetas = int(preparado['copias'].sum())
+        instrumentacion.contar('etiquetas_expandidas', etiquetas)
+        productos = len(self.data) if self.seleccion is None else int(self.seleccion.sum())
+        print(f"[OK] Generados datos para {etiquetas} etiquetas a partir de {productos} productos")
+
+    def leer_lotes(self, file_path=None, hoja=None, tamanio_lote=TAMANIO_LOTE):
+        """Lee el archivo por lotes de filas, sin cargarlo entero en memoria.
+
+        Los .xlsx se recorren con xlsx_rapido y los CSV con pandas por trozos; los
+        formatos antiguos (.xls) se leen enteros y se entregan igualmente por lotes.
+        Solo se leen las columnas de COLUMNAS_ETIQUETA.
+
+        Args:
+            file_path: Ruta al archivo Excel o CSV (opcional si ya se proporcionó en __init__)
+            hoja: Hoja del Excel a leer (nombre, posición empezando en 0 o None para la primera)
+            tamanio_lote: Número máximo de filas por lote
+
+        Yields:
+            DataFrames cuyo índice es la posición de cada fila entre las filas de datos,
+            el mismo que tendría con cargar_excel()
+        """
+        if file_path:
+            self.file_path = file_path
+        if not self.file_path:
+            raise ValueError("No se ha especificado la ruta del archivo Excel")
+        if not os.path.exists(self.file_path):
+            raise FileNotFoundError(f"El archivo Excel no existe en la ruta: {self.file_path}")
+
+        self.data = None
+        self.seleccion = None
+        self.codigos_actualizados = False
+        self.codigos_nuevos = {}
+        self.columnas_parciales = True
+        self.hoja = hoja
+
+        if self.file_path.lower().endswith('.csv'):
+            opciones = {'usecols': lambda nombre: nombre in COLUMNAS_ETIQUETA,
+                        'dtype': {nombre: tipo for nombre, tipo in TIPOS_COLUMNAS.items()}}
+            with pd.read_csv(self.file_path, encoding='utf-8-sig', chunksize=tamanio_lote, **opciones) as lector:
+                for lote in lector:
+                    instrumentacion.contar('filas_leidas', len(lote))
+                    yield lote
+            return
+
+        if not zipfile.is_zipfile(self.file_path):
+            data = _leer_tabla(self.file_path, COLUMNAS_ETIQUETA, hoja)
+            for inicio in range(0, len(data), tamanio_lote):
+                instrumentacion.contar('filas_leidas', min(tamanio_lote, len(data) - inicio))
+                yield data.iloc[inicio:inicio + tamanio_lote]
+            return
+
+        filas_leidas = leer_filas_xlsx(self.file_path, hoja, COLUMNAS_ETIQUETA)
+        encabezados = next(filas_leidas)
+        filas = []
+        inicio = 0
+        for fila in filas_leidas:
+            filas.append(fila)
+            if len(filas) == tamanio_lote:
+                instrumentacion.contar('filas_leidas', len(filas))
+                yield _tipar_lote(filas, encabezados, inicio)
+                inicio += len(filas)
+                filas = []
+        if filas:
+            instrumentacion.contar('filas_leidas', len(filas))
+            yield _tipar_lote(filas, encabezados, inicio)
+
+    def preparar_lote(self, lote, skus=None, filas=None):
+        """Prepara las etiquetas de un lote de filas leído con leer_lotes().
+
+        Args:
+            lote: DataFrame del lote
+            skus: Conjunto de SKU a incluir (None para no filtrar por SKU)
+            filas: Tupla (primera, última) con los números de producto a incluir,
+                empezando en 1 (None para no filtrar por posición)
+
+        Returns:
+            Tupla (productos, grupos) con el número de productos seleccionados del lote
+            y la lista de tuplas (datos_etiqueta, copias) de los que tienen stock
+        """
+        if filas is not None:
+            lote = lote[(lote.index >= filas[0] - 1) & (lote.index <= filas[1] - 1)]
+        if skus is not None:
+            lote = lote[_como_texto(_columna(lote, 'SKU')).isin(skus)]
+        if lote.empty:
+            return 0, []
+        preparado = self._preparar_datos_etiquetas(lote, informar=False)
+        return len(lote), list(_grupos(preparado[preparado['copias'] > 0]))
+
+    def iterar_grupos_tuberia(self, file_path=None, hoja=None, skus=None, filas=None,
+                              tamanio_lote=TAMANIO_LOTE, capacidad=CAPACIDAD_PREDETERMINADA):
+        """Como iterar_grupos_etiquetas(), pero leyendo y preparando el archivo por lotes.
+
+        La lectura y la preparación de los lotes corren cada una en su hilo, comunicadas
+        por colas acotadas (ver tuberia.en_hilo), mientras quien consume los grupos dibuja
+        las etiquetas. Si el dibujo va más lento, la lectura se detiene al llenarse las
+        colas, por lo que las filas en memoria no crecen con el tamaño del catálogo (el
+        PDF que se dibuja sí, salvo que se escriba por partes).
+
+        Los códigos de barras que ya tiene el libro se registran lote a lote, por lo que
+        un código nuevo del principio del libro solo se compara con los registrados
+        hasta ese momento. Los códigos generados quedan en codigos_nuevos y se guardan
+        igualmente con guardar_excel().
+
+        Args:
+            file_path: Ruta al archivo Excel o CSV (opcional si ya se proporcionó en __init__)
+            hoja: Hoja del Excel a leer (nombre, posición empezando en 0 o None para la primera)
+            skus: Conjunto de SKU a incluir (None para todos)
+            filas: Tupla (primera, última) con los números de producto a incluir (None para todos)
+            tamanio_lote: Número máximo de filas por lote
+            capacidad: Lotes que pueden esperar entre una etapa y la siguiente
+
+        Yields:
+            Tuplas (datos_etiqueta, copias), en el orden del archivo
+        """
+        productos = 0
+        etiquetas = 0
+        lotes = en_hilo(self.leer_lotes(file_path, hoja, tamanio_lote), capacidad=capacidad, nombre='leer_lotes')
+        preparados = en_hilo(lotes, transformar=lambda lote: self.preparar_lote(lote, skus, filas),
+                             capacidad=capacidad, nombre='preparar_lotes')
+        try:
+            for productos_lote, grupos in preparados:
+                productos += productos_lote
+                for grupo in grupos:
+                    etiquetas += grupo[1]
+                    yield grupo
+        finally:
+            preparados.close()
+
+        if self.codigos_nuevos:
+            print(f"[OK] Se generaron {len(self.codigos_nuevos)} nuevos códigos de barras")
+        instrumentacion.contar('etiquetas_expandidas', etiquetas)
+        print(f"[OK] Generados datos para {etiquetas} etiquetas a partir de {productos} productos")
+
+    def iterar_etiquetas(self):
+        """Recorre las etiquetas de forma perezosa, una por cada unidad en stock.
+
+        Yields:
+            DatosEtiqueta de cada etiqueta; las copias de un producto son el mismo registro
+        """
+        for etiqueta_data, copias in self.iterar_grupos_etiquetas():
+            for _ in range(copias):
+                yield etiqueta_data
+
+    def generar_datos_etiquetas(self):
+        """Genera los datos para las etiquetas, replicando cada producto según su stock.
+        También actualiza los códigos de barras en el DataFrame original.
+
+        Para catálogos grandes es preferible iterar_grupos_etiquetas(), que no
+        materializa una entrada por unidad en stock.
+
+        Returns:
+            Lista con los DatosEtiqueta de cada etiqueta
+        """
+        return list(self.iterar_etiquetas())
 
-        print(f"[OK] Generados datos para {total_etiquetas} etiquetas a partir de {len(self.data)} productos")
-        return datos_etiquetas
-    
     def guardar_excel(self, output_path=None):
-        """Guarda los datos actualizados con los nuevos códigos de barras al archivo Excel.
+        """Guarda los nuevos códigos de barras en el archivo Excel.
+
+        En los .xlsx solo se modifican las celdas de 'Código Barras' de las filas con
+        código nuevo, conservando el formato y el resto del libro; en los CSV, solo ese
+        campo de esas filas, copiando el resto del texto sin interpretarlo. El archivo se escribe
+        primero en un temporal de la misma carpeta y luego se renombra de forma atómica,
+        por lo que nunca queda a medio escribir.
         
         Args:
             output_path: Ruta para guardar el Excel actualizado (si es None, sobrescribe el original)
@@ -158,7 +626,7 @@ class ExcelManager:
         Returns:
             bool: True si se guardó correctamente, False en caso contrario
         """
-        if self.data is None or not self.codigos_actualizados:
+        if not self.codigos_actualizados:
             print("[AVISO] No hay datos o códigos de barras actualizados para guardar")
             return False
         
@@ -166,16 +634,167 @@ class ExcelManager:
         if output_path is None:
             output_path = self.file_path
         
+        temporal = None
         try:
             # Crear el directorio de salida si no existe
             output_dir = os.path.dirname(output_path)
             if output_dir and not os.path.exists(output_dir):
                 os.makedirs(output_dir)
-            
-            # Guardar el DataFrame actualizado al archivo Excel
-            self.data.to_excel(output_path, index=False)
-            print(f"[OK] Archivo Excel actualizado guardado en: {output_path}")
+
+            fd, temporal = tempfile.mkstemp(suffix=os.path.splitext(output_path)[1], dir=output_dir or ".")
+            os.close(fd)
+
+            with instrumentacion.etapa('guardar_excel'):
+                if self.file_path.lower().endswith('.csv') and output_path.lower().endswith('.csv'):
+                    self._escribir_codigos_csv(temporal)
+                elif self.file_path.lower().endswith('.csv') or output_path.lower().endswith('.csv'):
+                    self._escribir_tabla(temporal)
+                else:
+                    self._escribir_codigos_xlsx(temporal)
+
+            # mkstemp crea el archivo con permisos 0600: conservar los del archivo que se
+            # reemplaza (o los habituales según la umask) para no ocultarlo a otros usuarios
+            if os.path.exists(output_path):
+                shutil.copymode(output_path, temporal)
+            else:
+                umask = os.umask(0)
+                os.umask(umask)
+                os.chmod(temporal, 0o666 & ~umask)
+            os.replace(temporal, output_path)
+            temporal = None
+
+            # El archivo original cambió: renovar su copia en caché con los datos actuales
+            if (self.cache_dir and self.data is not None
+                    and os.path.abspath(output_path) == os.path.abspath(self.file_path)):
+                self._guardar_cache(*self._ruta_cache(self.columnas_parciales))
+            print(f"[OK] Archivo Excel actualizado guardado en: {output_path} ({len(self.codigos_nuevos)} códigos nuevos)")
             return True
         except Exception as e:
             print(f"[ERROR] Error al guardar el archivo Excel: {e}")
-            return False
\ No newline at end of file
+            return False
+        finally:
+            if temporal and os.path.exists(temporal):
+                os.remove(temporal)
+
+    def _posiciones_codigos_nuevos(self):
+        """Devuelve {posición de la fila de datos: código} de los códigos pendientes de guardar."""
+        if self.data is None:
+            # Leído por lotes: el índice de cada lote ya es la posición de la fila
+            return dict(self.codigos_nuevos)
+        return {self.data.index.get_loc(indice): codigo for indice, codigo in self.codigos_nuevos.items()}
+
+    def _escribir_codigos_xlsx(self, destino):
+        """Copia el libro original en `destino` actualizando solo las celdas de los códigos nuevos.
+
+        Se editan directamente las celdas en el XML de la hoja; si el libro tiene una
+        estructura que esa vía no contempla (por ejemplo, sin columna 'Código Barras'),
+        se recurre a openpyxl.
+        """
+        valores = self._posiciones_codigos_nuevos()
+        try:
+            actualizar_columna_xlsx(self.file_path, destino, 'Código Barras', valores, self.hoja)
+            return
+        except FormatoNoSoportado:
+            pass
+
+        from openpyxl import load_workbook
+
+        libro = load_workbook(self.file_path)
+        if isinstance(self.hoja, str):
+            hoja = libro[self.hoja]
+        else:
+            hoja = libro.worksheets[self.hoja or 0]  # pandas lee la primera hoja por defecto
+
+        # Fila de encabezados: la primera con contenido, igual que al leer con pandas
+        fila_encabezado = 1
+        for fila in hoja.iter_rows(min_row=1, max_row=hoja.max_row):
+            if any(celda.value is not None for celda in fila):
+                fila_encabezado = fila[0].row
+                break
+        encabezados = {celda.value: celda.column for celda in hoja[fila_encabezado] if celda.value is not None}
+
+        columna = encabezados.get('Código Barras')
+        if columna is None:
+            # La columna no existía: añadirla al final
+            columna = hoja.max_column + 1
+            hoja.cell(row=fila_encabezado, column=columna, value='Código Barras')
+
+        for fila_datos, codigo in valores.items():
+            fila = fila_encabezado + 1 + fila_datos
+            hoja.cell(row=fila, column=columna, value=int(codigo) if codigo.isdigit() else codigo)
+
+        libro.save(destino)
+
+    def _escribir_codigos_csv(self, destino):
+        """Copia el CSV original en `destino` cambiando solo el campo 'Código Barras' de los códigos nuevos.
+
+        El resto de campos se copia como texto, sin interpretarlo: los ceros a la izquierda
+        de SKU y referencias se conservan, y la marca BOM solo se escribe si el original la
+        tenía.
+        """
+        valores = self._posiciones_codigos_nuevos()
+        with open(self.file_path, 'rb') as archivo:
+            encoding = 'utf-8-sig' if archivo.read(3) == b'\xef\xbb\xbf' else 'utf-8'
+        with open(self.file_path, newline='', encoding=encoding) as archivo:
+            primera = archivo.readline()
+            archivo.seek(0)
+            filas = list(csv.reader(archivo))
+        fin_linea = '\r\n' if primera.endswith('\r\n') else '\n'
+
+        # Encabezados: la primera fila no vacía, igual que al leer con pandas (que también
+        # salta las líneas en blanco al numerar las filas de datos)
+        no_vacias = [numero for numero, fila in enumerate(filas) if fila]
+        if no_vacias:
+            encabezado = filas[no_vacias[0]]
+            if 'Código Barras' not in encabezado:
+                encabezado.append('Código Barras')
+            columna = encabezado.index('Código Barras')
+            datos = no_vacias[1:]
+            for fila_datos, codigo in valores.items():
+                fila = filas[datos[fila_datos]]
+                fila.extend([''] * (columna + 1 - len(fila)))
+                fila[columna] = codigo
+
+        with open(destino, 'w', newline='', encoding=encoding) as archivo:
+            csv.writer(archivo, lineterminator=fin_linea).writerows(filas)
+
+    def _escribir_tabla(self, destino):
+        """Reescribe la tabla completa (Excel a partir de un CSV, o CSV a partir de un Excel) con los códigos nuevos."""
+        datos = self.data
+        if datos is None:
+            # Leído por lotes: partir del archivo completo y poner solo los códigos nuevos
+            datos = _leer_tabla(self.file_path, hoja=self.hoja)
+            posiciones = self._posiciones_codigos_nuevos()
+            codigos = _columna(datos, 'Código Barras', float('nan')).astype(object)
+            codigos.iloc[list(posiciones)] = _codigos_como_numero(pd.Series(list(posiciones.values()))).tolist()
+            datos['Código Barras'] = codigos
+        elif self.columnas_parciales:
+            # Solo se leyeron algunas columnas: partir del archivo completo y
+            # actualizar en él la columna de códigos de barras
+            datos = _leer_tabla(self.file_path, hoja=self.hoja)
+            datos['Código Barras'] = _codigos_como_numero(self.data['Código Barras']).values
+
+        if destino.lower().endswith('.csv'):
+            datos.to_csv(destino, index=False, encoding='utf-8-sig')
+        else:
+            datos.to_excel(destino, index=False)
+
+    def respaldar_excel(self, backup_path):
+        """Copia el archivo de datos tal cual a una ruta de respaldo.
+
+        Args:
+            backup_path: Ruta del archivo de respaldo
+
+        Returns:
+            bool: True si se copió correctamente, False en caso contrario
+        """
+        try:
+            backup_dir = os.path.dirname(backup_path)
+            if backup_dir and not os.path.exists(backup_dir):
+                os.makedirs(backup_dir)
+            shutil.copy2(self.file_path, backup_path)
+            print(f"[OK] Respaldo del Excel guardado en: {backup_path}")
+            return True
+        except OSError as e:
+            print(f"[ERROR] Error al respaldar el archivo Excel: {e}")
+            return False
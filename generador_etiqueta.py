@@ -1,12 +1,178 @@
 from reportlab.pdfgen import canvas
 from reportlab.lib.units import cm
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.graphics.barcode import code128
-from reportlab.lib import colors
-from PIL import Image
-import random
 import os
-from etiqueta_pdf import Etiqueta
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from etiqueta_pdf import Etiqueta, GEOMETRIA_ETIQUETA
+import instrumentacion
+
+# Tamaño de la etiqueta y de cada página del PDF (50x38 mm)
+TAMANIO_ETIQUETA = (GEOMETRIA_ETIQUETA.ancho, GEOMETRIA_ETIQUETA.alto)
+
+# Campos que influyen en el dibujo de una etiqueta
+CAMPOS_DIBUJADOS = ('product_name', 'talla', 'precio', 'barcode_value', 'image_path')
+
+# Partes por proceso en el modo paralelo, para repartir mejor la carga entre procesos
+PARTES_POR_PROCESO = 4
+
+
+def dividir_en_partes(grupos_etiquetas, num_partes):
+    """Divide una lista de grupos (datos, copias) en partes contiguas con un número
+    similar de etiquetas, conservando el orden original.
+
+    Args:
+        grupos_etiquetas: Lista de tuplas (datos_etiqueta, copias)
+        num_partes: Número máximo de partes a generar
+
+    Returns:
+        Lista de listas de grupos; un grupo nunca se reparte entre dos partes
+    """
+    total = sum(copias for _, copias in grupos_etiquetas)
+    if total == 0:
+        return []
+
+    objetivo = total / max(1, num_partes)
+    partes = []
+    actual = []
+    acumulado = 0
+    for datos, copias in grupos_etiquetas:
+        if copias <= 0:
+            continue
+        actual.append((datos, copias))
+        acumulado += copias
+        # Cerrar la parte cuando alcanza su cuota proporcional de etiquetas
+        if acumulado >= objetivo * (len(partes) + 1) and len(partes) < num_partes - 1:
+            partes.append(actual)
+            actual = []
+    if actual:
+        partes.append(actual)
+    return partes
+
+
+def dividir_por_etiquetas(grupos_etiquetas, maximo):
+    """Reparte grupos (datos, copias) en partes de como máximo `maximo` etiquetas.
+
+    A diferencia de dividir_en_partes(), recorre los grupos de forma perezosa y parte
+    un grupo entre dos partes si sus copias no caben en la actual.
+
+    Args:
+        grupos_etiquetas: Iterable de tuplas (datos_etiqueta, copias)
+        maximo: Número máximo de etiquetas por parte
+
+    Yields:
+        Listas de grupos con `maximo` etiquetas (la última, con las que queden)
+    """
+    parte = []
+    cuenta = 0
+    for datos, copias in grupos_etiquetas:
+        while copias > 0:
+            tomar = min(copias, maximo - cuenta)
+            parte.append((datos, tomar))
+            cuenta += tomar
+            copias -= tomar
+            if cuenta == maximo:
+                yield parte
+                parte = []
+                cuenta = 0
+    if parte:
+        yield parte
+
+
+def _nombre_formulario(datos):
+    """Devuelve el nombre del formulario PDF reutilizable para unos datos de etiqueta.
+
+    Dos etiquetas con los mismos campos dibujados comparten el mismo formulario.
+
+    Args:
+        datos: Diccionario con los datos de la etiqueta
+
+    Returns:
+        String con el nombre del formulario
+    """
+    clave = "\x1f".join(str(datos.get(campo, '')) for campo in CAMPOS_DIBUJADOS)
+    return "etiqueta_" + hashlib.md5(clave.encode('utf-8')).hexdigest()
+
+
+def dibujar_grupos(c, grupos_etiquetas, formularios=None, cache=None):
+    """Dibuja grupos (datos, copias) en un canvas, una etiqueta por página.
+
+    Cada producto distinto se dibuja una sola vez como formulario PDF (XObject)
+    y las copias posteriores lo referencian. Los grupos se consumen de forma
+    perezosa, sin expandir las copias en memoria.
+
+    Args:
+        c: Objeto canvas de ReportLab con páginas del tamaño de la etiqueta
+        grupos_etiquetas: Iterable de tuplas (datos_etiqueta, copias)
+        formularios: Conjunto de formularios ya definidos en el canvas (se actualiza)
+        cache: Caché de formularios ya dibujados en ejecuciones anteriores (opcional,
+            ver cache_render.CacheRender)
+
+    Returns:
+        int: Número de etiquetas (páginas) dibujadas
+    """
+    if formularios is None:
+        formularios = set()
+    total = 0
+
+    for datos, copias in grupos_etiquetas:
+        if copias <= 0:
+            continue
+
+        nombre = _nombre_formulario(datos)
+        if nombre not in formularios:
+            # Dibujar la etiqueta una única vez dentro de un formulario
+            c.beginForm(nombre)
+            if cache is None or not cache.restaurar_formulario(c, nombre, datos):
+                Etiqueta(datos).dibujar(c, 0, 0)
+                if cache is not None:
+                    cache.guardar_formulario(c, nombre, datos)
+            c.endForm()
+            formularios.add(nombre)
+            instrumentacion.contar('formularios_dibujados')
+
+        # Colocar el formulario en el origen de una página nueva por cada copia
+        for _ in range(copias):
+            c.doForm(nombre)
+            c.showPage()
+        total += copias
+    instrumentacion.contar('paginas_dibujadas', total)
+    return total
+
+
+def combinar_pdfs(rutas, salida):
+    """Une varios PDF en orden en un único archivo, compartiendo los objetos idénticos
+    (como el logo) entre las partes.
+
+    Args:
+        rutas: Lista de rutas de los PDF a unir, en orden
+        salida: Ruta o archivo binario donde escribir el PDF combinado
+    """
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for ruta in rutas:
+        writer.append(ruta)
+    writer.compress_identical_objects()
+    if isinstance(salida, str):
+        with open(salida, "wb") as archivo:
+            writer.write(archivo)
+    else:
+        writer.write(salida)
+
+
+def _generar_parte(ruta, grupos_etiquetas):
+    """Genera el PDF de una parte en un proceso de trabajo.
+
+    Args:
+        ruta: Ruta del PDF de la parte
+        grupos_etiquetas: Lista de tuplas (datos_etiqueta, copias) de la parte
+
+    Returns:
+        int: Número de etiquetas generadas en la parte
+    """
+    return GeneradorEtiquetas(ruta).generar_pdf_grupos(grupos_etiquetas)
+
 
 class GeneradorEtiquetas:
     """Clase para generar un PDF con múltiples etiquetas."""
@@ -18,10 +184,9 @@ class GeneradorEtiquetas:
             output_file: Ruta del archivo PDF a generar
         """
         # Dimensiones de etiquetas (50x38 mm)
-        self.etiqueta_width = 5.0 * cm   # 50 mm
-        self.etiqueta_height = 3.8 * cm  # 38 mm
+        self.etiqueta_width, self.etiqueta_height = TAMANIO_ETIQUETA
         
-        # Sin espaciado entre etiquetas ya que solo generamos una
+        # Sin espaciado entre etiquetas ya que cada una ocupa su propia página
         self.padding_x = 0 * cm
         self.padding_y = 0 * cm
         
@@ -42,24 +207,163 @@ class GeneradorEtiquetas:
         self.page_size = custom_page_size
         self.canvas = canvas.Canvas(output_file, pagesize=custom_page_size)
         
-        # Solo una etiqueta por página
+        # Una etiqueta por página
         self.rows = 1
         self.cols = 1
         self.etiquetas_por_pagina = 1
     
     def generar_pdf(self, datos_etiquetas):
-        """Genera un PDF con una sola etiqueta.
-        
+        """Genera un PDF con una etiqueta por página.
+
         Args:
-            datos_etiquetas: Lista con un solo diccionario de datos para la etiqueta
+            datos_etiquetas: Iterable de diccionarios con los datos de cada etiqueta
+
+        Returns:
+            int: Número de etiquetas (páginas) generadas
         """
-        if len(datos_etiquetas) > 1:
-            print("[AVISO] Advertencia: Se proporcionó más de una etiqueta. Solo se generará la primera.")
-        
-        # Crear y dibujar la etiqueta en el origen de la página
-        etiqueta = Etiqueta(datos_etiquetas[0])
-        etiqueta.dibujar(self.canvas, 0, 0)
-        
-        # Guardar el PDF
-        self.canvas.save()
-        print(f"[OK] PDF generado: {self.output_file} con una etiqueta de {self.etiqueta_width/cm:.1f}x{self.etiqueta_height/cm:.1f} cm")
+        return self.generar_pdf_grupos((datos, 1) for datos in datos_etiquetas)
+
+    def generar_pdf_grupos(self, grupos_etiquetas):
+        """Genera un PDF con una etiqueta por página a partir de grupos (datos, copias).
+
+        Cada producto distinto se dibuja una sola vez (ver dibujar_grupos), por lo que
+        el tamaño del archivo crece con el número de productos y no con el de etiquetas.
+
+        Args:
+            grupos_etiquetas: Iterable de tuplas (datos_etiqueta, copias)
+
+        Returns:
+            int: Número de etiquetas (páginas) generadas
+        """
+        with instrumentacion.etapa('generar_pdf'):
+            formularios = set()
+            total = dibujar_grupos(self.canvas, grupos_etiquetas, formularios)
+
+            if total == 0:
+                print("[AVISO] No se proporcionaron etiquetas para generar")
+
+            # Guardar el PDF
+            self.canvas.save()
+        if isinstance(self.output_file, str):
+            instrumentacion.contar('bytes_escritos', os.path.getsize(self.output_file))
+        print(f"[OK] PDF generado: {self.output_file} con {total} etiquetas "
+              f"({len(formularios)} productos distintos) de {self.etiqueta_width/cm:.1f}x{self.etiqueta_height/cm:.1f} cm")
+        return total
+
+    def generar_pdf_por_partes(self, grupos_etiquetas, etiquetas_por_parte, destino=None, al_terminar_parte=None):
+        """Genera el PDF en partes de como máximo `etiquetas_por_parte` etiquetas.
+
+        ReportLab guarda todo el documento en memoria hasta save(), por lo que un único
+        PDF no se puede escribir por páginas. Aquí cada parte es un PDF completo (con sus
+        propias fuentes y logo) que se escribe en cuanto se llena y se libera antes de
+        empezar la siguiente: la memoria depende del tamaño de la parte y no del total, y
+        quien consume las partes (cola de impresión, subida) puede empezar con la primera
+        mientras se dibujan las demás. Los grupos se consumen de forma perezosa.
+
+        Args:
+            grupos_etiquetas: Iterable de tuplas (datos_etiqueta, copias)
+            etiquetas_por_parte: Número máximo de etiquetas de cada parte
+            destino: Función que recibe el número de parte (desde 1) y devuelve su ruta o
+                un objeto binario con write(); por defecto, '{salida}_parte_001.pdf'...
+                junto al archivo de salida y un manifiesto JSON con el orden de las partes
+            al_terminar_parte: Función opcional que se llama con (destino de la parte,
+                número de parte, etiquetas de la parte) al terminar de escribir cada una
+
+        Returns:
+            int: Número de etiquetas generadas
+        """
+        if etiquetas_por_parte < 1:
+            raise ValueError("etiquetas_por_parte debe ser al menos 1")
+        manifiesto = None
+        if destino is None:
+            base, _ = os.path.splitext(self.output_file)
+            manifiesto = []
+
+            def destino(numero):
+                return f"{base}_parte_{numero:03d}.pdf"
+
+        total = 0
+        with instrumentacion.etapa('generar_pdf_partes'):
+            for numero, grupos in enumerate(dividir_por_etiquetas(grupos_etiquetas, etiquetas_por_parte), start=1):
+                salida = destino(numero)
+                c = canvas.Canvas(salida, pagesize=self.page_size)
+                etiquetas = dibujar_grupos(c, grupos)
+                c.save()
+                del c  # Liberar el documento antes de avisar y de empezar la siguiente parte
+                if isinstance(salida, str):
+                    instrumentacion.contar('bytes_escritos', os.path.getsize(salida))
+                if manifiesto is not None:
+                    manifiesto.append({'archivo': os.path.basename(salida), 'etiquetas': etiquetas,
+                                       'primera_etiqueta': total + 1})
+                total += etiquetas
+                print(f"[OK] Parte {numero}: {salida if isinstance(salida, str) else 'flujo de salida'} "
+                      f"con {etiquetas} etiquetas")
+                if al_terminar_parte is not None:
+                    al_terminar_parte(salida, numero, etiquetas)
+
+        if total == 0:
+            print("[AVISO] No se proporcionaron etiquetas para generar")
+        if manifiesto:
+            ruta_manifiesto = f"{base}_partes.json"
+            with open(ruta_manifiesto, "w", encoding="utf-8") as archivo:
+                json.dump({'salida': os.path.basename(self.output_file), 'total_etiquetas': total, 'partes': manifiesto},
+                          archivo, ensure_ascii=False, indent=2)
+            print(f"[OK] {len(manifiesto)} partes con {total} etiquetas; manifiesto en: {ruta_manifiesto}")
+        return total
+
+    def generar_pdf_paralelo(self, grupos_etiquetas, procesos=None, combinar=True):
+        """Genera el PDF repartiendo las etiquetas en partes que se dibujan en varios procesos.
+
+        Cada parte es un PDF numerado junto al archivo de salida. Las partes se combinan
+        en orden en el archivo de salida (requiere pypdf) o, si no se combinan, se
+        conservan junto con un manifiesto JSON que indica su orden.
+
+        Combinar vuelve a interpretar y escribir todas las partes en un único proceso: con
+        catálogos grandes ese paso tarda más que dibujar todo en serie, por lo que solo el
+        dibujo escala con los núcleos. Sin combinar, el tiempo total sí se reduce.
+
+        Args:
+            grupos_etiquetas: Iterable de tuplas (datos_etiqueta, copias)
+            procesos: Número de procesos de trabajo (por defecto, uno por núcleo)
+            combinar: Si es True, une las partes en output_file y las elimina
+
+        Returns:
+            int: Número de etiquetas generadas
+        """
+        procesos = procesos or os.cpu_count() or 1
+        grupos = list(grupos_etiquetas)
+        partes = dividir_en_partes(grupos, procesos * PARTES_POR_PROCESO)
+        if not partes:
+            print("[AVISO] No se proporcionaron etiquetas para generar")
+            return 0
+
+        base, _ = os.path.splitext(self.output_file)
+        rutas = [f"{base}_parte_{i:03d}.pdf" for i in range(1, len(partes) + 1)]
+
+        print(f"[INFO] Generando {len(partes)} partes con {procesos} procesos")
+        with ProcessPoolExecutor(max_workers=procesos) as executor:
+            # map conserva el orden de las partes aunque terminen en otro orden
+            conteos = list(executor.map(_generar_parte, rutas, partes))
+
+        # Manifiesto con el orden de las partes y la primera etiqueta de cada una
+        manifiesto = []
+        primera = 1
+        for ruta, conteo in zip(rutas, conteos):
+            manifiesto.append({'archivo': os.path.basename(ruta), 'etiquetas': conteo, 'primera_etiqueta': primera})
+            primera += conteo
+        total = primera - 1
+
+        if combinar:
+            with instrumentacion.etapa('combinar_partes'):
+                combinar_pdfs(rutas, self.output_file)
+            instrumentacion.contar('bytes_escritos', os.path.getsize(self.output_file))
+            for ruta in rutas:
+                os.remove(ruta)
+            print(f"[OK] PDF generado: {self.output_file} con {total} etiquetas a partir de {len(partes)} partes")
+        else:
+            ruta_manifiesto = f"{base}_partes.json"
+            with open(ruta_manifiesto, "w", encoding="utf-8") as archivo:
+                json.dump({'salida': os.path.basename(self.output_file), 'total_etiquetas': total, 'partes': manifiesto},
+                          archivo, ensure_ascii=False, indent=2)
+            print(f"[OK] {len(partes)} partes con {total} etiquetas; manifiesto en: {ruta_manifiesto}")
+        return total
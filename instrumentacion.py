@@ -0,0 +1,155 @@
+"""Medición opcional de tiempos por etapa y contadores del proceso de etiquetas.
+
+Desactivada por defecto: en ese modo etapa() y contar() solo comprueban un indicador
+y no hacen nada más. Al activarla, cada etapa terminada y el resumen final se escriben
+como líneas JSON (JSON Lines) en un archivo o flujo.
+
+Uso:
+    import instrumentacion
+    instrumentacion.activar("output/metricas.jsonl")
+    with instrumentacion.etapa("cargar_excel"):
+        ...
+    instrumentacion.contar("filas_leidas", 120)
+    instrumentacion.cerrar()
+"""
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+# Variable de entorno que, si contiene una ruta, activa la medición en main.py
+VARIABLE_ENTORNO = "ETIQUETAS_METRICAS"
+
+_activo = False
+_destino = None
+_cerrar_destino = False
+_lock = threading.Lock()
+_contadores = {}
+_tiempos = {}
+_medidores = {}
+_NULO = nullcontext()
+
+
+class _Etapa:
+    """Cronómetro de una etapa; al terminar acumula su duración y la escribe en el destino."""
+
+    __slots__ = ('nombre', 'inicio')
+
+    def __init__(self, nombre):
+        self.nombre = nombre
+        self.inicio = None
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        segundos = time.perf_counter() - self.inicio
+        with _lock:
+            total, veces = _tiempos.get(self.nombre, (0.0, 0))
+            _tiempos[self.nombre] = (total + segundos, veces + 1)
+        _escribir({'tipo': 'etapa', 'nombre': self.nombre, 'segundos': round(segundos, 6),
+                   'error': tipo.__name__ if tipo else None})
+        return False
+
+
+def _escribir(registro):
+    """Escribe un registro JSON en el destino, si hay uno configurado."""
+    if _destino is None:
+        return
+    registro['ts'] = round(time.time(), 3)
+    linea = json.dumps(registro, ensure_ascii=False) + "\n"
+    with _lock:
+        _destino.write(linea)
+        _destino.flush()
+
+
+def activar(destino=None):
+    """Activa la medición.
+
+    Args:
+        destino: Ruta de un archivo JSON Lines (se añade al final), un objeto tipo
+            archivo de texto, o None para solo acumular en memoria (ver resumen())
+    """
+    global _activo, _destino, _cerrar_destino
+    cerrar()
+    if isinstance(destino, str):
+        directorio = os.path.dirname(destino)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        _destino = open(destino, "a", encoding="utf-8")
+        _cerrar_destino = True
+    else:
+        _destino = destino
+        _cerrar_destino = False
+    with _lock:
+        _contadores.clear()
+        _tiempos.clear()
+    _activo = True
+
+
+def activa():
+    """Indica si la medición está activada."""
+    return _activo
+
+
+def etapa(nombre):
+    """Devuelve un contexto que mide la duración de una etapa.
+
+    Args:
+        nombre: Nombre de la etapa (por ejemplo, 'cargar_excel')
+    """
+    if not _activo:
+        return _NULO
+    return _Etapa(nombre)
+
+
+def contar(nombre, cantidad=1):
+    """Suma una cantidad a un contador.
+
+    Args:
+        nombre: Nombre del contador (por ejemplo, 'etiquetas_expandidas')
+        cantidad: Valor a sumar
+    """
+    if not _activo:
+        return
+    with _lock:
+        _contadores[nombre] = _contadores.get(nombre, 0) + cantidad
+
+
+def registrar_medidor(nombre, funcion):
+    """Registra una función que aporta valores propios al resumen (por ejemplo, una caché).
+
+    Args:
+        nombre: Nombre con el que aparece en el resumen
+        funcion: Función sin argumentos que devuelve un diccionario serializable
+    """
+    _medidores[nombre] = funcion
+
+
+def resumen():
+    """Devuelve los tiempos acumulados por etapa, los contadores y los medidores registrados."""
+    with _lock:
+        datos = {
+            'etapas': {nombre: {'segundos': round(total, 6), 'veces': veces}
+                       for nombre, (total, veces) in _tiempos.items()},
+            'contadores': dict(_contadores),
+        }
+    datos['medidores'] = {nombre: funcion() for nombre, funcion in _medidores.items()}
+    return datos
+
+
+def cerrar():
+    """Escribe el resumen final (si la medición estaba activa) y desactiva la medición."""
+    global _activo, _destino, _cerrar_destino
+    if not _activo:
+        return
+    registro = resumen()
+    registro['tipo'] = 'resumen'
+    _escribir(registro)
+    _activo = False
+    if _cerrar_destino:
+        _destino.close()
+    _destino = None
+    _cerrar_destino = False
@@ -1,67 +1,288 @@
-from reportlab.lib.units import cm
-from generador_etiqueta import GeneradorEtiquetas
-from excel_manager import ExcelManager
+import argparse
 import os
+import sys
 from datetime import datetime
+import instrumentacion
+
+# pandas, ReportLab y PIL se importan solo en las etapas que los necesitan, para que
+# las consultas (--contar, --validar) respondan sin pagar su carga
+
+# Archivos por defecto
+EXCEL_PREDETERMINADO = "data/productos.xlsx"
+PDF_PREDETERMINADO = "output/etiquetas_productos.pdf"
+
+
+def _hoja(valor):
+    """Interpreta --hoja: un número es la posición de la hoja (0 = primera); si no, su nombre."""
+    return int(valor) if valor.isdigit() else valor
+
+
+def _rango_filas(valor):
+    """Interpreta --filas: 'N' o 'N-M' con números de producto empezando en 1."""
+    try:
+        partes = [int(parte) for parte in valor.split('-', 1)]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"rango no válido: {valor} (use N o N-M)")
+    primera, ultima = partes[0], partes[-1]
+    if primera < 1 or ultima < primera:
+        raise argparse.ArgumentTypeError(f"rango no válido: {valor} (use N o N-M)")
+    return primera, ultima
+
+
+def _entero_positivo(valor):
+    """Interpreta un número entero mayor que cero (--procesos, --dpi, --etiquetas-por-parte)."""
+    try:
+        numero = int(valor)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"número no válido: {valor} (use un entero mayor que 0)")
+    if numero < 1:
+        raise argparse.ArgumentTypeError(f"número no válido: {valor} (use un entero mayor que 0)")
+    return numero
+
+
+def crear_parser():
+    """Crea el analizador de argumentos de la línea de comandos."""
+    parser = argparse.ArgumentParser(description="Genera el PDF de etiquetas a partir del Excel de productos")
+    parser.add_argument('excel', nargs='?', default=EXCEL_PREDETERMINADO,
+                        help=f"Excel (.xlsx) o CSV de productos (por defecto {EXCEL_PREDETERMINADO}), "
+                             "o una carpeta para procesar todos sus libros y hojas")
+    parser.add_argument('-o', '--salida',
+                        help=f"Archivo a generar (por defecto {PDF_PREDETERMINADO}, o .zpl con --formato zpl); "
+                             "con una carpeta, la carpeta de salida (por defecto output/lote)")
+    parser.add_argument('--formato', choices=('pdf', 'zpl'), default='pdf',
+                        help="pdf para imprimir desde el ordenador; zpl para enviar a impresoras térmicas Zebra")
+    parser.add_argument('--dpi', type=_entero_positivo, default=203, help="Resolución de la impresora térmica (solo zpl)")
+    parser.add_argument('--hoja', type=_hoja, help="Hoja del Excel: nombre o posición (0 = primera)")
+    parser.add_argument('--sku', action='append',
+                        help="Generar solo estos SKU (se puede repetir o separar por comas)")
+    parser.add_argument('--filas', type=_rango_filas,
+                        help="Generar solo estos productos, por posición: N o N-M (1 = primer producto)")
+    parser.add_argument('--procesos', type=_entero_positivo,
+                        help="Procesos para dibujar el PDF (1 = sin paralelismo; con más de uno no se usa "
+                             "la caché); con una carpeta, libros que se procesan a la vez (por defecto, "
+                             "uno por núcleo)")
+    parser.add_argument('--combinar', action='store_true',
+                        help="Con --procesos, unir las partes en un único PDF (paso en serie con pypdf, "
+                             "más lento que dibujar en un solo proceso)")
+    parser.add_argument('--tuberia', action='store_true',
+                        help="Leer, preparar y dibujar a la vez por lotes (catálogos grandes); la memoria "
+                             "solo queda acotada junto con --etiquetas-por-parte")
+    parser.add_argument('--etiquetas-por-parte', type=_entero_positivo, metavar='N',
+                        help="Escribir el PDF en partes de N etiquetas a medida que se completan "
+                             "(memoria acotada; cada parte es un PDF independiente)")
+    parser.add_argument('--sin-cache', action='store_true',
+                        help="Dibujar todas las etiquetas sin reutilizar las de la ejecución anterior")
+    parser.add_argument('--registro',
+                        help="Registro de códigos de barras compartido por todos los Excel "
+                             "(por defecto data/registro_codigos.sqlite)")
+    parser.add_argument('--sin-registro', action='store_true',
+                        help="Generar los códigos que falten sin consultar ni actualizar el registro")
+
+    modo = parser.add_mutually_exclusive_group()
+    modo.add_argument('--contar', action='store_true', help="Solo contar productos y etiquetas")
+    modo.add_argument('--validar', action='store_true', help="Solo revisar el archivo y mostrar sus problemas")
+    modo.add_argument('--simular', action='store_true',
+                      help="Preparar las etiquetas sin escribir el PDF ni el Excel")
+    return parser
+
+
+def _skus(valores):
+    """Une los valores de --sku en un conjunto, o None si no se indicó ninguno."""
+    if not valores:
+        return None
+    return {sku.strip() for valor in valores for sku in valor.split(',') if sku.strip()}
+
+
+def consultar(args):
+    """Cuenta o valida el archivo sin cargar pandas (ver catalogo_rapido).
+
+    Returns:
+        int: Código de salida (1 si hay errores)
+    """
+    from catalogo_rapido import revisar_catalogo
+
+    resumen = revisar_catalogo(args.excel, args.hoja, _skus(args.sku), args.filas)
+    print(f"[INFO] {resumen['productos']} productos, {resumen['con_stock']} con stock, "
+          f"{resumen['etiquetas']} etiquetas, {resumen['sin_codigo']} sin código de barras")
+    if args.validar:
+        for aviso in resumen['avisos']:
+            print(f"[AVISO] {aviso}")
+    for error in resumen['errores']:
+        print(f"[ERROR] {error}")
+    if args.validar and not resumen['errores']:
+        print("[OK] El archivo es válido")
+    return 1 if resumen['errores'] else 0
+
+
+def procesar_directorio(args):
+    """Genera las etiquetas de todos los libros de una carpeta (ver procesar_carpeta).
+
+    Returns:
+        int: Código de salida (1 si algún libro u hoja falló)
+    """
+    from procesar_carpeta import procesar_carpeta, SALIDA_PREDETERMINADA
+
+    if args.contar or args.validar or args.simular or args.sku or args.filas or args.tuberia or args.combinar:
+        print("[ERROR] --contar, --validar, --simular, --sku, --filas, --tuberia y --combinar no se pueden "
+              "usar con una carpeta")
+        return 1
+
+    registro = None
+    if not args.sin_registro:
+        from registro_codigos import REGISTRO_PREDETERMINADO
+
+        registro = args.registro or REGISTRO_PREDETERMINADO
+    resumen = procesar_carpeta(args.excel, args.salida or SALIDA_PREDETERMINADA, procesos=args.procesos,
+                               hoja=args.hoja, formato=args.formato, registro=registro,
+                               cache_dir=None if args.sin_cache else "output/.cache_etiquetas/lote",
+                               dpi=args.dpi, etiquetas_por_parte=args.etiquetas_por_parte)
+    return 1 if resumen['errores'] else 0
+
+
+def main(argv=None):
+    """Función principal para generar las etiquetas.
+
+    Args:
+        argv: Argumentos de la línea de comandos (por defecto, los del proceso)
+
+    Returns:
+        int: Código de salida
+    """
+    args = crear_parser().parse_args(argv)
+    excel_path = args.excel
+    output_path = args.salida
+    if output_path is None:
+        output_path = PDF_PREDETERMINADO
+        if args.formato == 'zpl':
+            output_path = os.path.splitext(PDF_PREDETERMINADO)[0] + ".zpl"
+
+    # Medición por etapas: se activa con la ruta del archivo JSON Lines en la variable
+    # de entorno ETIQUETAS_METRICAS (por ejemplo, output/metricas.jsonl)
+    metricas = os.environ.get(instrumentacion.VARIABLE_ENTORNO)
+    if metricas:
+        instrumentacion.activar(metricas)
 
-def main():
-    """Función principal para generar las etiquetas."""
-    # Ruta del archivo Excel (ajustar según corresponda)
-    excel_path = "data/productos.xlsx"
-    
     # Verificar si el archivo existe
     if not os.path.exists(excel_path):
         print(f"[ERROR] El archivo Excel no existe en {excel_path}")
-        print("Por favor, coloque el archivo Excel en la carpeta 'data' o ajuste la ruta.")
-        return
-    
+        print("Por favor, coloque el archivo Excel en la carpeta 'data' o indique su ruta.")
+        return 1
+
+    if os.path.isdir(excel_path):
+        return procesar_directorio(args)
+
+    if args.contar or args.validar:
+        return consultar(args)
+
+    from excel_manager import ExcelManager
+
+    # Registro de códigos de barras; la simulación no lo modifica
+    registro = None
+    if not args.sin_registro and not args.simular:
+        from registro_codigos import RegistroCodigos, REGISTRO_PREDETERMINADO
+
+        registro = RegistroCodigos(args.registro or REGISTRO_PREDETERMINADO)
+
+    # Crear manejador de Excel y cargar datos; en tubería se leen por lotes al generar
+    excel_manager = ExcelManager(excel_path, registro=registro)
+    tuberia = args.tuberia and not args.simular
+    if not tuberia:
+        excel_manager.cargar_excel(hoja=args.hoja)
+        if args.sku or args.filas:
+            seleccionados = excel_manager.seleccionar(_skus(args.sku), args.filas)
+            print(f"[INFO] {seleccionados} productos seleccionados")
+
+    if args.simular:
+        preparado = excel_manager.preparar_datos_etiquetas()
+        print(f"[INFO] Simulación: se generarían {int(preparado['copias'].sum())} etiquetas "
+              f"y {len(excel_manager.codigos_nuevos)} códigos de barras nuevos; no se escribió ningún archivo")
+        return 0
+
     # Crear el directorio de salida si no existe
-    if not os.path.exists("output"):
-        os.makedirs("output")
-    
-    # Crear manejador de Excel y cargar datos
-    excel_manager = ExcelManager(excel_path)
-    excel_manager.cargar_excel()
-    
-    # Generar datos para etiquetas basados en el stock de cada producto
-    datos_etiquetas = excel_manager.generar_datos_etiquetas()
+    output_dir = os.path.dirname(output_path)
+    if output_dir and not os.path.exists(output_dir):
+        os.makedirs(output_dir)
 
     # Helper local para mostrar los datos sin revelar el SKU
-    def mask_sku(lista):
-        masked = []
-        for d in lista:
-            copy = dict(d)
-            if 'sku' in copy:
-                copy['sku'] = '*** oculto ***'
-            masked.append(copy)
-        return masked
-
-    print(mask_sku(datos_etiquetas))
-    
-    # Guardar el Excel con los códigos de barras generados
-    # Podemos guardar una copia para no modificar el original
-    current_time = datetime.now().strftime("%Y-%m-%d_%H%M%S")
-    excel_backup = f"data/productos_con_codigos_{current_time}.xlsx"
-    excel_manager.guardar_excel(excel_backup)
-    
-    # También podemos sobrescribir el original si se desea
-    excel_manager.guardar_excel()
-    
+    def mask_sku(datos):
+        return datos._replace(sku='*** oculto ***')
+
+    # Recorrer los productos de forma perezosa: cada uno se emite una sola vez
+    # junto con el número de copias según su stock, sin expandir la lista completa
+    def grupos_etiquetas():
+        if tuberia:
+            grupos = excel_manager.iterar_grupos_tuberia(hoja=args.hoja, skus=_skus(args.sku), filas=args.filas)
+        else:
+            grupos = excel_manager.iterar_grupos_etiquetas()
+        primero = True
+        for datos, copias in grupos:
+            if primero:
+                print("El primer producto es:", mask_sku(datos))
+                primero = False
+            yield datos, copias
+
+    # Dibujar en varios procesos solo se aplica al PDF completo, y entonces sin caché
+    paralelo = bool(args.procesos and args.procesos > 1)
+    if paralelo and (args.formato == 'zpl' or args.etiquetas_por_parte):
+        print("[AVISO] --procesos no se usa con --formato zpl ni con --etiquetas-por-parte; "
+              "se genera en un solo proceso")
+    elif args.combinar and not paralelo:
+        print("[AVISO] --combinar solo se usa con --procesos mayor que 1")
+    elif paralelo and not args.sin_cache:
+        print("[INFO] Con --procesos las etiquetas se dibujan en varios procesos sin usar la caché")
+
+    # Generar PDF con etiquetas; cada producto se replica según su stock disponible
+    if args.formato == 'zpl':
+        from etiqueta_zpl import GeneradorZPL
+
+        # Una orden por producto con su número de copias
+        total_etiquetas = GeneradorZPL(output_path, dpi=args.dpi).generar_zpl_grupos(grupos_etiquetas())
+    elif args.etiquetas_por_parte:
+        from generador_etiqueta import GeneradorEtiquetas
+
+        # Cada parte se escribe y se libera en cuanto se llena
+        generador = GeneradorEtiquetas(output_path)
+        total_etiquetas = generador.generar_pdf_por_partes(grupos_etiquetas(), args.etiquetas_por_parte)
+    elif not args.sin_cache and not paralelo:
+        from cache_render import CacheRender, directorio_cache
+
+        # Una caché por libro y hoja, para no perder la de otros catálogos
+        cache = CacheRender(directorio_cache(excel_path, args.hoja))
+        total_etiquetas = cache.generar_pdf_incremental(grupos_etiquetas(), output_path)['etiquetas']
+    else:
+        from generador_etiqueta import GeneradorEtiquetas
+
+        # Crear generador de etiquetas con página del tamaño de la etiqueta
+        generador = GeneradorEtiquetas(output_path)
+        if paralelo:
+            # Por defecto se dejan las partes y su manifiesto: unirlas con pypdf es un paso en
+            # serie que tarda más que dibujar todo en un solo proceso
+            total_etiquetas = generador.generar_pdf_paralelo(grupos_etiquetas(), procesos=args.procesos,
+                                                             combinar=args.combinar)
+        else:
+            total_etiquetas = generador.generar_pdf_grupos(grupos_etiquetas())
+
+    # Guardar en el Excel solo las celdas de los códigos de barras generados
+    if excel_manager.codigos_actualizados and excel_manager.guardar_excel():
+        # Copia de respaldo del Excel ya actualizado, junto al original, sin volver a escribirlo
+        current_time = datetime.now().strftime("%Y-%m-%d_%H%M%S")
+        base, extension = os.path.splitext(excel_path)
+        excel_manager.respaldar_excel(f"{base}_con_codigos_{current_time}{extension}")
+
     # Si no hay etiquetas para generar, terminar
-    if not datos_etiquetas:
+    if not total_etiquetas:
         print("[AVISO] No hay productos con stock para generar etiquetas")
-        return
-    print(f"[OK] Se generarán {len(datos_etiquetas)} etiquetas basadas en el stock de los productos.")
-    print("Cada producto se replicará según su stock disponible.")
-    print("El primer producto es:", mask_sku([datos_etiquetas[0]])[0])
-    
-    # Crear generador de etiquetas con página de 10.02cm de ancho
-    generador = GeneradorEtiquetas("output/etiquetas_productos.pdf")
-    
-    # Generar PDF con etiquetas
-    generador.generar_pdf(datos_etiquetas)
-    
-    print(f"[OK] PDF generado en: output/etiquetas_productos.pdf")
+        return 0
+
+    if args.formato == 'pdf' and (args.etiquetas_por_parte or (paralelo and not args.combinar)):
+        print(f"[OK] PDF generado en partes junto a: {output_path} con {total_etiquetas} etiquetas")
+    else:
+        print(f"[OK] {args.formato.upper()} generado en: {output_path} con {total_etiquetas} etiquetas")
+    return 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    try:
+        codigo = main()
+    finally:
+        instrumentacion.cerrar()
+    sys.exit(codigo)
@@ -0,0 +1,258 @@
+"""Generación por lotes de las etiquetas de todos los libros de una carpeta.
+
+Cada tienda deja su Excel en data/; este módulo encuentra todos los libros y sus hojas,
+genera un PDF (o ZPL) por hoja repartiendo los libros entre varios procesos y escribe
+un resumen con las etiquetas, los códigos nuevos, los tiempos y los errores de cada uno.
+
+Las hojas de un mismo libro se procesan en el mismo proceso, una tras otra, porque los
+códigos de barras nuevos se guardan en el propio libro.
+"""
+import json
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+# Resolución por defecto de las impresoras ZPL (la misma que etiqueta_zpl.DPI_PREDETERMINADO)
+DPI_PREDETERMINADO = 203
+
+# Extensiones de los libros que se procesan
+EXTENSIONES_LIBRO = ('.xlsx', '.xlsm', '.xls', '.csv')
+
+# Carpeta por defecto de los PDF y del resumen del lote
+SALIDA_PREDETERMINADA = "output/lote"
+
+# Caracteres que no se usan en los nombres de archivo generados a partir de las hojas
+_NO_VALIDOS_RE = re.compile(r'[^\w.-]+')
+
+# Parte del nombre de las copias de respaldo que genera main.py, que no se vuelven a procesar
+MARCA_RESPALDO = "_con_codigos_"
+
+
+def _es_libro(nombre):
+    """Indica si un archivo de la carpeta es un libro de productos a procesar."""
+    if nombre.startswith(('~$', '.')):
+        # Archivos de bloqueo de Office (~$libro.xlsx) y de LibreOffice (.~lock.libro.xlsx#)
+        return False
+    if MARCA_RESPALDO in nombre:
+        return False
+    return nombre.lower().endswith(EXTENSIONES_LIBRO)
+
+
+def buscar_libros(directorio):
+    """Devuelve las rutas de los libros de productos de una carpeta, ordenadas por nombre.
+
+    Args:
+        directorio: Carpeta con los Excel o CSV de las tiendas (no se recorren subcarpetas)
+    """
+    return [os.path.join(directorio, nombre) for nombre in sorted(os.listdir(directorio))
+            if _es_libro(nombre) and os.path.isfile(os.path.join(directorio, nombre))]
+
+
+def hojas_libro(path):
+    """Devuelve los nombres de las hojas de un libro ([None] para los CSV)."""
+    if path.lower().endswith('.csv'):
+        return [None]
+    if zipfile.is_zipfile(path):
+        from xlsx_rapido import nombres_hojas
+
+        return nombres_hojas(path)
+    import pandas as pd
+
+    with pd.ExcelFile(path) as libro:
+        return list(libro.sheet_names)
+
+
+def _nombre_salida(path, hoja, varias_hojas, extension, con_extension=False):
+    """Nombre del archivo de etiquetas de una hoja: 'libro.pdf' o 'libro_hoja.pdf'.
+
+    Con con_extension se conserva la extensión del libro ('libro_xlsx.pdf'), para que
+    'tienda.xlsx' y 'tienda.csv' de la misma carpeta no escriban el mismo archivo.
+    """
+    base, origen = os.path.splitext(os.path.basename(path))
+    if con_extension:
+        base = f"{base}_{origen.lstrip('.').lower()}"
+    if varias_hojas:
+        base = f"{base}_{_NO_VALIDOS_RE.sub('_', hoja).strip('_') or 'hoja'}"
+    return base + extension
+
+
+def _generar_hoja(excel_manager, path, hoja, salida, formato, cache_dir, dpi, etiquetas_por_parte):
+    """Genera las etiquetas de una hoja y guarda sus códigos nuevos.
+
+    Returns:
+        Diccionario con las etiquetas generadas, los códigos nuevos de la hoja y la
+        salida (el manifiesto de las partes si el PDF se escribió por partes)
+    """
+    grupos = excel_manager.iterar_grupos_tuberia(path, hoja)
+    primero = next(grupos, None)
+    etiquetas = 0
+    if primero is not None:
+        def todos():
+            yield primero
+            yield from grupos
+
+        if formato == 'zpl':
+            from etiqueta_zpl import GeneradorZPL
+
+            etiquetas = GeneradorZPL(salida, dpi=dpi).generar_zpl_grupos(todos())
+        elif etiquetas_por_parte:
+            from generador_etiqueta import GeneradorEtiquetas
+
+            etiquetas = GeneradorEtiquetas(salida).generar_pdf_por_partes(todos(), etiquetas_por_parte)
+            salida = f"{os.path.splitext(salida)[0]}_partes.json"
+        elif cache_dir:
+            from cache_render import CacheRender, directorio_cache
+
+            cache = CacheRender(directorio_cache(path, hoja, base=cache_dir))
+            etiquetas = cache.generar_pdf_incremental(todos(), salida)['etiquetas']
+        else:
+            from generador_etiqueta import GeneradorEtiquetas
+
+            etiquetas = GeneradorEtiquetas(salida).generar_pdf_grupos(todos())
+
+    codigos_nuevos = len(excel_manager.codigos_nuevos)
+    if excel_manager.codigos_actualizados and not excel_manager.guardar_excel():
+        raise RuntimeError("No se pudieron guardar los códigos de barras nuevos en el libro")
+    return {'etiquetas': etiquetas, 'codigos_nuevos': codigos_nuevos,
+            'salida': salida if primero is not None else None}
+
+
+def procesar_libro(path, directorio_salida, hoja=None, formato='pdf', registro=None, cache_dir=None,
+                   dpi=DPI_PREDETERMINADO, etiquetas_por_parte=None, con_extension=False):
+    """Genera las etiquetas de todas las hojas de un libro (se ejecuta en un proceso de trabajo).
+
+    Un error en una hoja se anota en su resultado y no impide procesar las demás. Si se
+    guardaron códigos nuevos, al terminar se deja una copia de respaldo del libro junto
+    al original, igual que main.py.
+
+    Args:
+        path: Ruta del libro
+        directorio_salida: Carpeta donde escribir un archivo de etiquetas por hoja
+        hoja: Procesar solo esta hoja (nombre o posición); None para todas
+        formato: 'pdf' o 'zpl'
+        registro: Ruta del registro de códigos de barras (None para no usarlo)
+        cache_dir: Carpeta base de la caché de dibujo, una subcarpeta por libro y hoja (None para no usarla)
+        dpi: Resolución de la impresora para el formato ZPL
+        etiquetas_por_parte: Escribir el PDF de cada hoja en partes de como máximo este
+            número de etiquetas (None para un único PDF por hoja)
+        con_extension: Incluir la extensión del libro en los nombres de salida (cuando
+            otro libro de la carpeta tiene el mismo nombre)
+
+    Returns:
+        Lista de diccionarios, uno por hoja, con 'libro', 'hoja', 'salida', 'etiquetas',
+        'codigos_nuevos', 'segundos' y 'error'
+    """
+    from excel_manager import ExcelManager
+
+    resultados = []
+    try:
+        hojas = hojas_libro(path)
+    except Exception as e:
+        return [{'libro': path, 'hoja': None, 'salida': None, 'etiquetas': 0, 'codigos_nuevos': 0,
+                 'segundos': 0.0, 'error': f"No se pudieron leer las hojas: {e}"}]
+    if hoja is not None:
+        hojas = [hojas[hoja] if isinstance(hoja, int) and hoja < len(hojas) else hoja]
+
+    registro_codigos = None
+    if registro:
+        from registro_codigos import RegistroCodigos
+
+        registro_codigos = RegistroCodigos(registro)
+    excel_manager = ExcelManager(path, registro=registro_codigos)
+    try:
+        for nombre_hoja in hojas:
+            salida = os.path.join(directorio_salida,
+                                  _nombre_salida(path, nombre_hoja, len(hojas) > 1, '.' + formato,
+                                                 con_extension))
+            inicio = time.perf_counter()
+            resultado = {'libro': path, 'hoja': nombre_hoja, 'salida': None, 'etiquetas': 0,
+                         'codigos_nuevos': 0, 'error': None}
+            try:
+                resultado.update(_generar_hoja(excel_manager, path, nombre_hoja, salida, formato,
+                                            cache_dir, dpi, etiquetas_por_parte))
+            except Exception as e:
+                print(f"[ERROR] {path} ({nombre_hoja}): {e}")
+                resultado['error'] = str(e)
+            resultado['segundos'] = round(time.perf_counter() - inicio, 3)
+            resultados.append(resultado)
+
+        if any(resultado['codigos_nuevos'] and not resultado['error'] for resultado in resultados):
+            base, extension = os.path.splitext(path)
+            excel_manager.respaldar_excel(f"{base}{MARCA_RESPALDO}{datetime.now():%Y-%m-%d_%H%M%S}{extension}")
+    finally:
+        if registro_codigos is not None:
+            registro_codigos.cerrar()
+    return resultados
+
+
+def procesar_carpeta(directorio, directorio_salida=SALIDA_PREDETERMINADA, procesos=None, hoja=None,
+                     formato='pdf', registro=None, cache_dir=None, dpi=DPI_PREDETERMINADO,
+                     etiquetas_por_parte=None):
+    """Genera las etiquetas de todos los libros de una carpeta en varios procesos.
+
+    Args:
+        directorio: Carpeta con los libros de las tiendas
+        directorio_salida: Carpeta de los archivos de etiquetas y del resumen
+        procesos: Número de procesos de trabajo (por defecto, uno por núcleo)
+        hoja: Procesar solo esta hoja de cada libro (nombre o posición); None para todas
+        formato: 'pdf' o 'zpl'
+        registro: Ruta del registro de códigos de barras (None para no usarlo)
+        cache_dir: Carpeta base de la caché de dibujo (None para no usarla)
+        dpi: Resolución de la impresora para el formato ZPL
+        etiquetas_por_parte: Escribir el PDF de cada hoja en partes de como máximo este
+            número de etiquetas (None para un único PDF por hoja)
+
+    Returns:
+        Diccionario del resumen: fecha, totales, segundos y la lista 'hojas' con el
+        resultado de cada hoja; también se guarda como JSON en directorio_salida
+    """
+    libros = buscar_libros(directorio)
+    # Libros con el mismo nombre y distinta extensión (tienda.xlsx y tienda.csv)
+    nombres = [os.path.splitext(os.path.basename(path))[0].lower() for path in libros]
+    repetidos = {nombre for nombre in nombres if nombres.count(nombre) > 1}
+    os.makedirs(directorio_salida, exist_ok=True)
+    procesos = max(1, min(procesos or os.cpu_count() or 1, len(libros) or 1))
+    print(f"[INFO] {len(libros)} libros en {directorio}; procesando con {procesos} procesos")
+
+    inicio = time.perf_counter()
+    por_libro = {}
+    with ProcessPoolExecutor(max_workers=procesos) as executor:
+        futuros = {executor.submit(procesar_libro, path, directorio_salida, hoja, formato, registro,
+                                   cache_dir, dpi, etiquetas_por_parte,
+                                   os.path.splitext(os.path.basename(path))[0].lower() in repetidos): path
+                   for path in libros}
+        for futuro in as_completed(futuros):
+            path = futuros[futuro]
+            try:
+                por_libro[path] = futuro.result()
+            except Exception as e:
+                # El proceso de trabajo terminó de forma inesperada
+                por_libro[path] = [{'libro': path, 'hoja': None, 'salida': None, 'etiquetas': 0,
+                                    'codigos_nuevos': 0, 'segundos': 0.0, 'error': str(e)}]
+            etiquetas = sum(resultado['etiquetas'] for resultado in por_libro[path])
+            errores = sum(1 for resultado in por_libro[path] if resultado['error'])
+            estado = "[OK]" if not errores else "[ERROR]"
+            print(f"{estado} {os.path.basename(path)}: {len(por_libro[path])} hojas, {etiquetas} etiquetas"
+                  + (f", {errores} con errores" if errores else ""))
+
+    hojas = [resultado for path in libros for resultado in por_libro[path]]
+    resumen = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'carpeta': directorio,
+        'libros': len(libros),
+        'hojas_procesadas': len(hojas),
+        'etiquetas': sum(resultado['etiquetas'] for resultado in hojas),
+        'codigos_nuevos': sum(resultado['codigos_nuevos'] for resultado in hojas),
+        'errores': sum(1 for resultado in hojas if resultado['error']),
+        'segundos': round(time.perf_counter() - inicio, 3),
+        'hojas': hojas,
+    }
+    ruta_resumen = os.path.join(directorio_salida, f"resumen_{datetime.now():%Y-%m-%d_%H%M%S}.json")
+    with open(ruta_resumen, "w", encoding="utf-8") as archivo:
+        json.dump(resumen, archivo, ensure_ascii=False, indent=2)
+    print(f"[OK] {resumen['etiquetas']} etiquetas de {len(hojas)} hojas en {resumen['segundos']:.1f} s; "
+          f"{resumen['codigos_nuevos']} códigos nuevos, {resumen['errores']} errores. Resumen en: {ruta_resumen}")
+    return resumen
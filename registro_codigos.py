@@ -0,0 +1,208 @@
+"""Registro persistente de los códigos de barras asignados a cada SKU.
+
+Guarda en SQLite todos los códigos emitidos o encontrados en los Excel, indexados por
+SKU y por código, para reutilizarlos sin recalcularlos y para que dos SKU (del mismo
+libro o de libros distintos) no terminen con el mismo código.
+"""
+import os
+import random
+import sqlite3
+from datetime import datetime
+
+from excel_manager import _codigo_barras
+import instrumentacion
+
+# Ruta por defecto del registro, junto a los Excel de las tiendas
+REGISTRO_PREDETERMINADO = "data/registro_codigos.sqlite"
+
+# Máximo de parámetros por consulta (SQLite admite al menos 999)
+_LOTE = 900
+
+# Intentos máximos para encontrar un código libre ante colisiones
+_MAX_INTENTOS = 1000
+
+# Colisiones resueltas que se detallan por consola en cada asignación
+_MAX_AVISOS = 20
+
+# Segundos que se espera a que otro proceso termine de escribir en el registro
+_ESPERA_BLOQUEO = 60
+
+
+def _lotes(valores, tamanio=_LOTE):
+    """Divide una lista en lotes consecutivos de como máximo `tamanio` elementos."""
+    for inicio in range(0, len(valores), tamanio):
+        yield valores[inicio:inicio + tamanio]
+
+
+class ColisionCodigo(RuntimeError):
+    """No se encontró un código libre para un SKU tras el máximo de intentos."""
+
+
+class RegistroCodigos:
+    """Registro SQLite de códigos de barras por SKU.
+
+    Cada operación en bloque (registrar_existentes, asignar) se hace en una sola
+    transacción. Las búsquedas usan los índices por SKU y por código, por lo que su
+    coste no crece de forma apreciable con millones de SKU registrados. Varios procesos
+    pueden compartir el mismo archivo: las asignaciones se hacen una tras otra.
+    """
+
+    def __init__(self, ruta=REGISTRO_PREDETERMINADO):
+        """Abre (o crea) el registro.
+
+        Args:
+            ruta: Ruta del archivo SQLite, o ':memory:' para un registro temporal
+        """
+        self.ruta = ruta
+        directorio = os.path.dirname(ruta) if ruta != ':memory:' else ''
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+        # En la tubería (ExcelManager.iterar_grupos_tuberia) el registro se usa desde el
+        # hilo de preparación, nunca desde dos hilos a la vez
+        self.conexion = sqlite3.connect(ruta, timeout=_ESPERA_BLOQUEO, check_same_thread=False)
+        self.conexion.execute("PRAGMA journal_mode=WAL")
+        self.conexion.execute("PRAGMA synchronous=NORMAL")
+        self.conexion.execute("""
+            CREATE TABLE IF NOT EXISTS codigos (
+                sku TEXT PRIMARY KEY,
+                codigo TEXT NOT NULL UNIQUE,
+                origen TEXT,
+                creado TEXT
+            )""")
+        self.conexion.commit()
+
+    def __len__(self):
+        return self.conexion.execute("SELECT COUNT(*) FROM codigos").fetchone()[0]
+
+    def buscar(self, skus):
+        """Busca en bloque los códigos registrados de varios SKU.
+
+        Args:
+            skus: Iterable de SKU (se normalizan con str().strip())
+
+        Returns:
+            Diccionario {sku: código} solo con los SKU registrados
+        """
+        claves = list({str(sku).strip() for sku in skus})
+        encontrados = {}
+        for lote in _lotes(claves):
+            marcas = ",".join("?" * len(lote))
+            encontrados.update(self.conexion.execute(
+                f"SELECT sku, codigo FROM codigos WHERE sku IN ({marcas})", lote))
+        return encontrados
+
+    def _duenos(self, codigos):
+        """Devuelve {código: sku} de los códigos que ya están registrados."""
+        codigos = list(codigos)
+        duenos = {}
+        for lote in _lotes(codigos):
+            marcas = ",".join("?" * len(lote))
+            duenos.update(self.conexion.execute(
+                f"SELECT codigo, sku FROM codigos WHERE codigo IN ({marcas})", lote))
+        return duenos
+
+    def registrar_existentes(self, pares, origen=None):
+        """Registra los códigos que ya tienen los productos de un libro.
+
+        Los SKU ya registrados conservan su código. Un código que en el registro (o en
+        el mismo libro) pertenece a otro SKU no se registra y se informa como colisión.
+
+        Args:
+            pares: Iterable de tuplas (sku, código)
+            origen: Texto con la procedencia (por ejemplo, la ruta del Excel)
+
+        Returns:
+            Lista de tuplas (sku, código, otro_sku) con las colisiones encontradas
+        """
+        filas = [(str(sku).strip(), str(codigo).strip()) for sku, codigo in pares]
+        creado = datetime.now().isoformat(timespec='seconds')
+        with self.conexion:
+            # Tomar ya el bloqueo de escritura: si otro proceso escribe entre la consulta y
+            # la inserción, SQLite no podría esperarlo y fallaría con 'database is locked'
+            self.conexion.execute("BEGIN IMMEDIATE")
+            self.conexion.execute("CREATE TEMP TABLE IF NOT EXISTS entrada (sku TEXT, codigo TEXT)")
+            self.conexion.execute("CREATE INDEX IF NOT EXISTS temp.entrada_codigo ON entrada (codigo)")
+            self.conexion.execute("DELETE FROM entrada")
+            self.conexion.executemany("INSERT INTO entrada VALUES (?, ?)", filas)
+
+            # Mismo código para SKU distintos: contra el registro y dentro del propio libro
+            colisiones = self.conexion.execute("""
+                SELECT e.sku, e.codigo, c.sku FROM entrada e
+                JOIN codigos c ON c.codigo = e.codigo AND c.sku <> e.sku""").fetchall()
+            colisiones += self.conexion.execute("""
+                SELECT e.sku, e.codigo, MIN(o.sku) FROM entrada e
+                JOIN entrada o ON o.codigo = e.codigo AND o.sku < e.sku
+                GROUP BY e.sku, e.codigo""").fetchall()
+
+            self.conexion.execute("""
+                INSERT OR IGNORE INTO codigos (sku, codigo, origen, creado)
+                SELECT sku, codigo, ?, ? FROM entrada""", (origen, creado))
+            self.conexion.execute("DELETE FROM entrada")
+        return colisiones
+
+    def asignar(self, skus, origen=None):
+        """Devuelve el código de cada SKU, reutilizando los registrados y registrando los nuevos.
+
+        Los códigos nuevos se calculan igual que generar_codigos_barras(). Si un código
+        ya pertenece a otro SKU, se prueba con el SKU seguido de un número de intento
+        ('SKU\\x1f1', 'SKU\\x1f2'...) hasta encontrar uno libre, por lo que la
+        resolución es determinista.
+
+        Args:
+            skus: Iterable (lista, Serie, columna) con los SKU de los productos
+            origen: Texto con la procedencia de los códigos nuevos
+
+        Returns:
+            Lista de strings con el código de cada SKU, en el mismo orden
+
+        Raises:
+            ColisionCodigo: Si no se encuentra un código libre para algún SKU
+        """
+        claves = [str(sku).strip() for sku in skus]
+        # Reservar la escritura desde la consulta: otro proceso no puede asignar entre
+        # medias el mismo código (o el mismo SKU) a la vez
+        with self.conexion:
+            self.conexion.execute("BEGIN IMMEDIATE")
+            codigos = self.buscar(claves)
+            pendientes = [sku for sku in dict.fromkeys(claves) if sku not in codigos]
+            instrumentacion.contar('codigos_reutilizados', len(codigos))
+            instrumentacion.contar('codigos_generados', len(pendientes))
+
+            if pendientes:
+                generador = random.Random()
+                candidatos = {sku: _codigo_barras(sku, generador) for sku in pendientes}
+                ocupados = self._duenos(set(candidatos.values()))
+                nuevos = []
+                resueltas = 0
+                for sku in pendientes:
+                    codigo = candidatos[sku]
+                    intento = 0
+                    while ocupados.get(codigo, sku) != sku:
+                        intento += 1
+                        if intento > _MAX_INTENTOS:
+                            raise ColisionCodigo(f"No se encontró un código libre para el SKU {sku}")
+                        codigo = _codigo_barras(f"{sku}\x1f{intento}", generador)
+                        if codigo not in ocupados:
+                            ocupados.update(self._duenos([codigo]))
+                    if intento:
+                        resueltas += 1
+                        if resueltas <= _MAX_AVISOS:
+                            print(f"[AVISO] El código de {sku} coincidía con el de {ocupados[candidatos[sku]]}; "
+                                  f"se asignó {codigo}")
+                    ocupados[codigo] = sku
+                    codigos[sku] = codigo
+                    nuevos.append((sku, codigo))
+
+                if resueltas > _MAX_AVISOS:
+                    print(f"[AVISO] ... y {resueltas - _MAX_AVISOS} colisiones más resueltas con otro código")
+                instrumentacion.contar('colisiones_resueltas', resueltas)
+
+                creado = datetime.now().isoformat(timespec='seconds')
+                self.conexion.executemany(
+                    "INSERT INTO codigos (sku, codigo, origen, creado) VALUES (?, ?, ?, ?)",
+                    [(sku, codigo, origen, creado) for sku, codigo in nuevos])
+        return [codigos[sku] for sku in claves]
+
+    def cerrar(self):
+        """Cierra la conexión con el registro."""
+        self.conexion.close()
@@ -0,0 +1,312 @@
+"""Servicio local que mantiene cargado el generador de etiquetas para reimpresiones rápidas.
+
+Importa ReportLab, carga las fuentes y el logo y dibuja una etiqueta de prueba una sola
+vez al arrancar; después cada trabajo solo paga el dibujo de sus etiquetas. Los trabajos
+llegan como JSON por HTTP, en localhost o en un socket Unix, y la respuesta es el PDF.
+
+Uso:
+    python servicio_etiquetas.py --puerto 8765
+    python servicio_etiquetas.py --socket /tmp/etiquetas.sock
+
+Petición (POST /etiquetas):
+    {"etiquetas": [{"product_name": "Jean Gaby Blue", "talla": "Talla 28",
+                    "precio": "S/ 99.90", "barcode_value": "123456789012", "copias": 2}]}
+
+GET /salud devuelve el estado del servicio en JSON.
+"""
+import argparse
+import io
+import json
+import os
+import socket
+import socketserver
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from reportlab.pdfgen import canvas
+from generador_etiqueta import TAMANIO_ETIQUETA, dibujar_grupos
+import instrumentacion
+
+# Logo de las etiquetas; el servicio no acepta rutas de imagen enviadas por el cliente
+LOGO = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "logo.jpeg")
+
+# Campos obligatorios de cada etiqueta de un trabajo
+CAMPOS_TRABAJO = ('product_name', 'talla', 'precio', 'barcode_value')
+
+# Límites por trabajo: el servicio está pensado para reimpresiones de pocas etiquetas
+MAX_ETIQUETAS_TRABAJO = 500
+MAX_BYTES_PETICION = 1024 * 1024
+
+
+class TrabajoNoValido(ValueError):
+    """El JSON recibido no describe un trabajo de etiquetas válido."""
+
+
+class ServicioOcupado(RuntimeError):
+    """Todos los trabajadores están ocupados y la cola de espera está llena."""
+
+
+def leer_trabajo(contenido):
+    """Convierte el JSON de un trabajo en grupos (datos_etiqueta, copias).
+
+    Args:
+        contenido: Bytes o texto con el JSON del trabajo
+
+    Returns:
+        Lista de tuplas (datos_etiqueta, copias)
+
+    Raises:
+        TrabajoNoValido: Si el JSON no tiene el formato esperado o supera los límites
+    """
+    try:
+        trabajo = json.loads(contenido)
+    except ValueError as e:
+        raise TrabajoNoValido(f"JSON no válido: {e}") from None
+
+    etiquetas = trabajo.get('etiquetas') if isinstance(trabajo, dict) else None
+    if not isinstance(etiquetas, list) or not etiquetas:
+        raise TrabajoNoValido("Se esperaba una lista no vacía en 'etiquetas'")
+
+    grupos = []
+    total = 0
+    for i, etiqueta in enumerate(etiquetas):
+        if not isinstance(etiqueta, dict):
+            raise TrabajoNoValido(f"La etiqueta {i} no es un objeto")
+        faltantes = [campo for campo in CAMPOS_TRABAJO if campo not in etiqueta]
+        if faltantes:
+            raise TrabajoNoValido(f"A la etiqueta {i} le faltan campos: {', '.join(faltantes)}")
+
+        copias = etiqueta.get('copias', 1)
+        if not isinstance(copias, int) or isinstance(copias, bool) or copias < 0:
+            raise TrabajoNoValido(f"Número de copias no válido en la etiqueta {i}")
+        total += copias
+        if total > MAX_ETIQUETAS_TRABAJO:
+            raise TrabajoNoValido(f"El trabajo supera el máximo de {MAX_ETIQUETAS_TRABAJO} etiquetas")
+
+        datos = {campo: str(etiqueta[campo]) for campo in CAMPOS_TRABAJO}
+        datos['sku'] = str(etiqueta.get('sku', ''))
+        datos['image_path'] = LOGO
+        grupos.append((datos, copias))
+    return grupos
+
+
+def generar_pdf_bytes(grupos_etiquetas):
+    """Genera en memoria el PDF de unos grupos (datos, copias).
+
+    Args:
+        grupos_etiquetas: Iterable de tuplas (datos_etiqueta, copias)
+
+    Returns:
+        Tupla (bytes del PDF, número de etiquetas)
+    """
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=TAMANIO_ETIQUETA)
+    total = dibujar_grupos(c, grupos_etiquetas)
+    c.save()
+    return buffer.getvalue(), total
+
+
+class ServicioEtiquetas:
+    """Genera los PDF de los trabajos con un número fijo de trabajadores.
+
+    Como máximo `trabajadores` trabajos se dibujan a la vez y otros `cola` esperan su
+    turno; los que lleguen por encima de ese límite se rechazan con ServicioOcupado
+    en lugar de acumularse en memoria.
+    """
+
+    def __init__(self, trabajadores=2, cola=8):
+        """Inicializa el servicio y precalienta el generador.
+
+        Args:
+            trabajadores: Número de trabajos que se dibujan a la vez
+            cola: Número de trabajos que pueden esperar a un trabajador libre
+        """
+        self.trabajadores = trabajadores
+        self.cola = cola
+        self._executor = ThreadPoolExecutor(max_workers=trabajadores, thread_name_prefix="etiquetas")
+        self._plazas = threading.BoundedSemaphore(trabajadores + cola)
+        self._lock = threading.Lock()
+        self.atendidos = 0
+        self.rechazados = 0
+        self._precalentar()
+
+    def _precalentar(self):
+        """Dibuja una etiqueta de prueba para cargar fuentes, logo y código de barras."""
+        datos = {'product_name': 'Etiqueta de prueba', 'talla': 'Talla 28', 'precio': 'S/ 99.90',
+                 'barcode_value': '000000000000', 'sku': '', 'image_path': LOGO}
+        generar_pdf_bytes([(datos, 1)])
+
+    def generar(self, grupos_etiquetas):
+        """Genera el PDF de un trabajo en uno de los trabajadores y espera el resultado.
+
+        Args:
+            grupos_etiquetas: Lista de tuplas (datos_etiqueta, copias)
+
+        Returns:
+            Tupla (bytes del PDF, número de etiquetas)
+
+        Raises:
+            ServicioOcupado: Si no queda sitio en la cola de espera
+        """
+        if not self._plazas.acquire(blocking=False):
+            with self._lock:
+                self.rechazados += 1
+            raise ServicioOcupado("Servicio ocupado, inténtelo de nuevo en unos segundos")
+        try:
+            with instrumentacion.etapa('servicio_trabajo'):
+                resultado = self._executor.submit(generar_pdf_bytes, grupos_etiquetas).result()
+        finally:
+            self._plazas.release()
+        with self._lock:
+            self.atendidos += 1
+        instrumentacion.contar('trabajos_servidos')
+        return resultado
+
+    def estado(self):
+        """Devuelve el estado del servicio como diccionario serializable."""
+        with self._lock:
+            return {'estado': 'ok', 'trabajadores': self.trabajadores, 'cola': self.cola,
+                    'atendidos': self.atendidos, 'rechazados': self.rechazados}
+
+    def cerrar(self):
+        """Espera a los trabajos en curso y libera los trabajadores."""
+        self._executor.shutdown(wait=True)
+
+
+class ManejadorEtiquetas(BaseHTTPRequestHandler):
+    """Atiende las peticiones HTTP del servicio (el servicio se toma de self.server)."""
+
+    server_version = "ServicioEtiquetas/1.0"
+
+    def address_string(self):
+        # En un socket Unix la dirección del cliente no es una tupla (host, puerto)
+        if isinstance(self.client_address, tuple) and self.client_address:
+            return str(self.client_address[0])
+        return "unix"
+
+    def _responder(self, codigo, cuerpo, tipo):
+        self.send_response(codigo)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _responder_json(self, codigo, datos):
+        self._responder(codigo, json.dumps(datos, ensure_ascii=False).encode("utf-8"),
+                        "application/json; charset=utf-8")
+
+    def do_GET(self):
+        if self.path == "/salud":
+            self._responder_json(200, self.server.servicio.estado())
+        else:
+            self._responder_json(404, {'error': "Ruta no encontrada"})
+
+    def do_POST(self):
+        if self.path != "/etiquetas":
+            self._responder_json(404, {'error': "Ruta no encontrada"})
+            return
+
+        try:
+            longitud = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            self._responder_json(411, {'error': "Falta la cabecera Content-Length"})
+            return
+        if longitud < 0:
+            self._responder_json(400, {'error': "Cabecera Content-Length no válida"})
+            return
+        if longitud > MAX_BYTES_PETICION:
+            self._responder_json(413, {'error': "Petición demasiado grande"})
+            return
+
+        try:
+            grupos = leer_trabajo(self.rfile.read(longitud))
+            pdf, total = self.server.servicio.generar(grupos)
+        except TrabajoNoValido as e:
+            self._responder_json(400, {'error': str(e)})
+            return
+        except ServicioOcupado as e:
+            self._responder_json(503, {'error': str(e)})
+            return
+        except Exception as e:
+            print(f"[ERROR] Error al generar el trabajo: {e}")
+            self._responder_json(500, {'error': "Error al generar las etiquetas"})
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/pdf")
+        self.send_header("Content-Length", str(len(pdf)))
+        self.send_header("X-Etiquetas", str(total))
+        self.end_headers()
+        self.wfile.write(pdf)
+
+
+class ServidorUnix(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Servidor HTTP sobre un socket Unix, con un hilo por conexión."""
+
+    daemon_threads = True
+
+
+def crear_servidor(servicio, host="127.0.0.1", puerto=8765, socket_path=None):
+    """Crea el servidor HTTP del servicio, en localhost o en un socket Unix.
+
+    Args:
+        servicio: ServicioEtiquetas que genera los PDF
+        host: Dirección en la que escuchar (solo si no se usa socket_path)
+        puerto: Puerto TCP (solo si no se usa socket_path)
+        socket_path: Ruta del socket Unix; si se indica, se usa en lugar de TCP
+
+    Returns:
+        Servidor listo para serve_forever()
+    """
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        servidor = ServidorUnix(socket_path, ManejadorEtiquetas, bind_and_activate=False)
+    else:
+        servidor = ThreadingHTTPServer((host, puerto), ManejadorEtiquetas, bind_and_activate=False)
+    # La cola de conexiones pendientes (5 por defecto) debe admitir al menos todos los
+    # trabajos en curso y en espera; si no, una ráfaga de clientes ve conexiones rechazadas
+    # en lugar de la respuesta 503 del servicio
+    servidor.request_queue_size = max(socket.SOMAXCONN, servicio.trabajadores + servicio.cola)
+    try:
+        servidor.server_bind()
+        servidor.server_activate()
+    except BaseException:
+        servidor.server_close()
+        raise
+    servidor.servicio = servicio
+    return servidor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servicio local de generación de etiquetas")
+    parser.add_argument('--host', default='127.0.0.1', help="Dirección en la que escuchar")
+    parser.add_argument('--puerto', type=int, default=8765, help="Puerto TCP")
+    parser.add_argument('--socket', help="Ruta de un socket Unix (en lugar de TCP)")
+    parser.add_argument('--trabajadores', type=int, default=2, help="Trabajos que se dibujan a la vez")
+    parser.add_argument('--cola', type=int, default=8, help="Trabajos que pueden esperar turno")
+    args = parser.parse_args()
+
+    metricas = os.environ.get(instrumentacion.VARIABLE_ENTORNO)
+    if metricas:
+        instrumentacion.activar(metricas)
+
+    servicio = ServicioEtiquetas(args.trabajadores, args.cola)
+    servidor = crear_servidor(servicio, args.host, args.puerto, args.socket)
+    direccion = args.socket or f"http://{args.host}:{args.puerto}"
+    print(f"[OK] Servicio de etiquetas escuchando en {direccion} ({args.trabajadores} trabajadores)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("[INFO] Deteniendo el servicio")
+    finally:
+        servidor.server_close()
+        servicio.cerrar()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+        instrumentacion.cerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""Pruebas de la validación rápida del catálogo frente a la generación con ExcelManager."""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from catalogo_rapido import revisar_catalogo  # noqa: E402
+from excel_manager import ExcelManager  # noqa: E402
+
+
+def _catalogo_con_precios_vacios():
+    return pd.DataFrame({
+        'SKU': ['A-1', 'A-2', 'A-3'],
+        'Stock': [1, 2, 3],
+        'Código Barras': ['775000000001', '775000000002', '775000000003'],
+        'Nombre Etiqueta': ['Jean', 'Jean', 'Polo'],
+        'Variante': ['Talla 26', 'Talla 28', 'M'],
+        'Precio handtag': [99.9, np.nan, np.nan],
+    })
+
+
+@pytest.mark.parametrize('extension', ['.xlsx', '.csv'])
+def test_validar_acepta_precios_vacios_como_la_generacion(tmp_path, extension):
+    path = str(tmp_path / f"catalogo{extension}")
+    datos = _catalogo_con_precios_vacios()
+    if extension == '.csv':
+        datos.to_csv(path, index=False)
+    else:
+        datos.to_excel(path, index=False)
+
+    resumen = revisar_catalogo(path)
+
+    manager = ExcelManager(path, cache_dir=None)
+    manager.cargar_excel()
+    etiquetas = sum(copias for _, copias in manager.iterar_grupos_etiquetas())
+    assert resumen['errores'] == []
+    assert resumen['etiquetas'] == etiquetas == 6
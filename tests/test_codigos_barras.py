@@ -0,0 +1,39 @@
+"""Pruebas de la generación de códigos de barras a partir del SKU."""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from excel_manager import ExcelManager, generar_codigos_barras  # noqa: E402
+
+# Códigos que generaba la versión original (random.seed(sku) por producto); los
+# catálogos ya impresos dependen de que no cambien
+CODIGOS_ORIGINALES = {
+    '0625-JEAN-GAB-BG-26': '601255216136',
+    '0625-JEAN-GAB-BG-28': '600246881407',
+    '00123': '600914419353',
+    'A-1': '601154311005',
+    'Ñandú-XL': '602946899828',
+    ' espacios ': '603326459398',
+    123: '600539804155',
+    'POLO-M': '601349236863',
+}
+
+
+def test_codigos_iguales_a_los_originales():
+    skus = list(CODIGOS_ORIGINALES)
+    assert generar_codigos_barras(skus) == list(CODIGOS_ORIGINALES.values())
+    assert [ExcelManager().generar_barcode(sku) for sku in skus] == list(CODIGOS_ORIGINALES.values())
+
+
+def test_skus_repetidos_reciben_el_mismo_codigo():
+    assert generar_codigos_barras(['A-1', 'POLO-M', 'A-1']) == [
+        CODIGOS_ORIGINALES['A-1'], CODIGOS_ORIGINALES['POLO-M'], CODIGOS_ORIGINALES['A-1']]
+
+
+def test_no_modifica_el_estado_global_de_random():
+    random.seed(1234)
+    estado = random.getstate()
+    generar_codigos_barras(list(CODIGOS_ORIGINALES))
+    assert random.getstate() == estado
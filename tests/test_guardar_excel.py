@@ -0,0 +1,91 @@
+"""Pruebas del guardado atómico de los códigos de barras en el Excel y en los CSV."""
+import os
+import stat
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from excel_manager import ExcelManager  # noqa: E402
+
+
+def _libro_sin_codigos(path):
+    pd.DataFrame({
+        'SKU': ['A-1', 'A-2'],
+        'Stock': [1, 2],
+        'Código Barras': [None, None],
+        'Nombre Etiqueta': ['Jean', 'Jean'],
+        'Variante': ['Talla 26', 'Talla 28'],
+        'Precio handtag': [99.9, 99.9],
+    }).to_excel(path, index=False)
+
+
+def _modo(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+def test_guardar_excel_conserva_permisos(tmp_path):
+    ruta = str(tmp_path / "productos.xlsx")
+    _libro_sin_codigos(ruta)
+    os.chmod(ruta, 0o644)
+
+    manager = ExcelManager(ruta, cache_dir=None)
+    manager.cargar_excel()
+    manager.preparar_datos_etiquetas()
+    assert manager.guardar_excel()
+
+    assert _modo(ruta) == 0o644
+    assert manager.respaldar_excel(str(tmp_path / "respaldo.xlsx"))
+    assert _modo(str(tmp_path / "respaldo.xlsx")) == 0o644
+
+
+def test_guardar_excel_en_archivo_nuevo_usa_umask(tmp_path):
+    ruta = str(tmp_path / "productos.xlsx")
+    _libro_sin_codigos(ruta)
+    destino = str(tmp_path / "salida" / "productos.xlsx")
+
+    manager = ExcelManager(ruta, cache_dir=None)
+    manager.cargar_excel()
+    manager.preparar_datos_etiquetas()
+    assert manager.guardar_excel(destino)
+
+    umask = os.umask(0)
+    os.umask(umask)
+    assert _modo(destino) == 0o666 & ~umask
+
+
+_CSV_CON_CEROS = (
+    "SKU,Ref,Stock,Código Barras,Nombre Etiqueta,Variante,Precio handtag\n"
+    "00123,0042,1,775000000001,Jean,Talla 26,99.90\n"
+    "00124,0043,2,,Jean,Talla 28,99.90\n"
+)
+
+
+def _codigo_nuevo(manager):
+    return next(iter(manager.codigos_nuevos.values()))
+
+
+def test_guardar_csv_solo_cambia_los_codigos_nuevos(tmp_path):
+    ruta = tmp_path / "productos.csv"
+    ruta.write_text(_CSV_CON_CEROS, encoding="utf-8")
+
+    manager = ExcelManager(str(ruta), cache_dir=None)
+    manager.cargar_excel()
+    manager.preparar_datos_etiquetas()
+    assert manager.guardar_excel()
+
+    esperado = _CSV_CON_CEROS.replace("00124,0043,2,,", f"00124,0043,2,{_codigo_nuevo(manager)},")
+    assert ruta.read_bytes() == esperado.encode("utf-8")
+
+
+def test_guardar_csv_leido_por_lotes_conserva_bom_y_ceros(tmp_path):
+    ruta = tmp_path / "productos.csv"
+    ruta.write_text(_CSV_CON_CEROS.replace("\n", "\r\n"), encoding="utf-8-sig")
+
+    manager = ExcelManager(str(ruta), cache_dir=None)
+    list(manager.iterar_grupos_tuberia())
+    assert manager.guardar_excel()
+
+    esperado = _CSV_CON_CEROS.replace("00124,0043,2,,", f"00124,0043,2,{_codigo_nuevo(manager)},")
+    assert ruta.read_bytes() == esperado.replace("\n", "\r\n").encode("utf-8-sig")
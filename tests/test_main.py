@@ -0,0 +1,22 @@
+"""Pruebas de los argumentos de la línea de comandos."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import crear_parser  # noqa: E402
+
+
+@pytest.mark.parametrize('opcion', ['--etiquetas-por-parte', '--procesos', '--dpi'])
+@pytest.mark.parametrize('valor', ['0', '-5', 'x'])
+def test_opciones_numericas_exigen_un_entero_positivo(opcion, valor):
+    with pytest.raises(SystemExit):
+        crear_parser().parse_args(['catalogo.xlsx', opcion, valor])
+
+
+def test_opciones_numericas_validas():
+    args = crear_parser().parse_args(['catalogo.xlsx', '--etiquetas-por-parte', '2000',
+                                      '--procesos', '4', '--dpi', '300'])
+    assert (args.etiquetas_por_parte, args.procesos, args.dpi) == (2000, 4, 300)
@@ -0,0 +1,46 @@
+"""Pruebas de la generación por lotes de una carpeta de libros."""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from procesar_carpeta import procesar_carpeta  # noqa: E402
+
+
+def _catalogo(precios):
+    return pd.DataFrame({
+        'SKU': [f'A-{i}' for i in range(len(precios))],
+        'Stock': [1] * len(precios),
+        'Código Barras': [f'77500000000{i}' for i in range(len(precios))],
+        'Nombre Etiqueta': ['Jean'] * len(precios),
+        'Variante': ['Talla 28'] * len(precios),
+        'Precio handtag': precios,
+    })
+
+
+def test_libro_escrito_por_pandas_con_precios_vacios(tmp_path):
+    carpeta = tmp_path / "data"
+    carpeta.mkdir()
+    _catalogo([99.9, np.nan, np.nan]).to_excel(carpeta / "b.xlsx", index=False)
+
+    resumen = procesar_carpeta(str(carpeta), str(tmp_path / "lote"), procesos=1)
+
+    assert resumen['errores'] == 0
+    assert resumen['etiquetas'] == 3
+    assert os.path.exists(tmp_path / "lote" / "b.pdf")
+
+
+def test_libros_con_el_mismo_nombre_no_se_sobrescriben(tmp_path):
+    carpeta = tmp_path / "data"
+    carpeta.mkdir()
+    _catalogo([99.9]).to_excel(carpeta / "tienda.xlsx", index=False)
+    _catalogo([10.0, 20.0]).to_csv(carpeta / "tienda.csv", index=False)
+
+    resumen = procesar_carpeta(str(carpeta), str(tmp_path / "lote"), procesos=1)
+
+    salidas = sorted(os.path.basename(hoja['salida']) for hoja in resumen['hojas'])
+    assert resumen['errores'] == 0
+    assert salidas == ['tienda_csv.pdf', 'tienda_xlsx.pdf']
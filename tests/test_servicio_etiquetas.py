@@ -0,0 +1,72 @@
+"""Pruebas del servicio HTTP de etiquetas."""
+import builtins
+import http.client
+import os
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import servicio_etiquetas  # noqa: E402
+from servicio_etiquetas import LOGO, ServicioEtiquetas, crear_servidor, generar_pdf_bytes  # noqa: E402
+
+
+@pytest.fixture
+def servidor():
+    servicio = ServicioEtiquetas(trabajadores=2, cola=30)
+    servidor = crear_servidor(servicio, puerto=0)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+    servicio.cerrar()
+
+
+def _post(servidor, cuerpo, cabeceras):
+    conexion = http.client.HTTPConnection(*servidor.server_address[:2], timeout=5)
+    try:
+        conexion.request("POST", "/etiquetas", body=cuerpo, headers=cabeceras)
+        respuesta = conexion.getresponse()
+        return respuesta.status, respuesta.read()
+    finally:
+        conexion.close()
+
+
+def test_content_length_negativo_devuelve_400(servidor):
+    estado, _ = _post(servidor, b"", {"Content-Length": "-1"})
+    assert estado == 400
+
+
+def test_cola_de_conexiones_admite_trabajos_en_curso_y_en_espera(monkeypatch):
+    # Con un SOMAXCONN pequeño, el tamaño lo fijan los trabajadores y la cola
+    monkeypatch.setattr(servicio_etiquetas.socket, 'SOMAXCONN', 4)
+    servicio = ServicioEtiquetas(trabajadores=2, cola=30)
+    servidor = crear_servidor(servicio, puerto=0)
+    try:
+        assert servidor.request_queue_size == 2 + 30
+    finally:
+        servidor.server_close()
+        servicio.cerrar()
+
+
+def test_los_trabajos_no_vuelven_a_leer_el_logo(monkeypatch):
+    datos = {'product_name': 'Jean Gaby', 'talla': 'Talla 28', 'precio': 'S/ 99.90',
+             'barcode_value': '775000000001', 'sku': 'A-1', 'image_path': LOGO}
+    generar_pdf_bytes([(datos, 1)])
+
+    aperturas = []
+    abrir = builtins.open
+
+    def contar_aperturas(archivo, *args, **kwargs):
+        if os.path.abspath(str(archivo)) == os.path.abspath(LOGO):
+            aperturas.append(archivo)
+        return abrir(archivo, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, 'open', contar_aperturas)
+    for _ in range(3):
+        pdf, total = generar_pdf_bytes([(datos, 2)])
+        assert total == 2 and b'/DCTDecode' in pdf
+    assert aperturas == []
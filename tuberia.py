@@ -0,0 +1,101 @@
+"""Etapas en hilos comunicadas por colas acotadas.
+
+en_hilo() recorre un iterable en un hilo propio y entrega sus elementos por una cola de
+capacidad fija: si el consumidor va más lento, el hilo se detiene al llenarse la cola
+(contrapresión), por lo que nunca hay en memoria más de `capacidad` elementos en espera.
+Encadenando varias llamadas, la lectura, la preparación y el dibujo se solapan.
+
+Uso:
+    lotes = en_hilo(leer_lotes(), nombre='leer_lotes')
+    preparados = en_hilo(lotes, transformar=preparar, nombre='preparar_lotes')
+    for lote in preparados:
+        dibujar(lote)
+"""
+import queue
+import threading
+
+import instrumentacion
+
+# Elementos que pueden esperar en cada cola entre dos etapas
+CAPACIDAD_PREDETERMINADA = 4
+
+# Segundos entre comprobaciones de cancelación mientras la cola está llena
+_ESPERA = 0.1
+
+_FIN = object()
+
+
+class _Error:
+    """Excepción de la etapa, que se vuelve a lanzar en el hilo del consumidor."""
+
+    __slots__ = ('excepcion',)
+
+    def __init__(self, excepcion):
+        self.excepcion = excepcion
+
+
+def _producir(iterable, transformar, cola, detener, nombre):
+    """Recorre el iterable y deja sus elementos en la cola hasta terminar o ser cancelado."""
+    iterador = iter(iterable)
+    try:
+        with instrumentacion.etapa(nombre):
+            for elemento in iterador:
+                if transformar is not None:
+                    elemento = transformar(elemento)
+                while not detener.is_set():
+                    try:
+                        cola.put(elemento, timeout=_ESPERA)
+                        break
+                    except queue.Full:
+                        instrumentacion.contar(f'{nombre}_esperas')
+                if detener.is_set():
+                    return
+        final = _FIN
+    except BaseException as e:
+        final = _Error(e)
+    finally:
+        # Si el iterable es otra etapa o un generador, cerrarlo libera a sus productores
+        cerrar = getattr(iterador, 'close', None)
+        if cerrar is not None:
+            cerrar()
+
+    while not detener.is_set():
+        try:
+            cola.put(final, timeout=_ESPERA)
+            return
+        except queue.Full:
+            pass
+
+
+def en_hilo(iterable, transformar=None, capacidad=CAPACIDAD_PREDETERMINADA, nombre='etapa'):
+    """Recorre un iterable en un hilo propio y devuelve sus elementos en orden.
+
+    Las excepciones del iterable se relanzan en el consumidor. Si el consumidor deja de
+    iterar (por un error o al cerrar el generador), el hilo se detiene y cierra el iterable.
+
+    Args:
+        iterable: Iterable a recorrer; solo lo recorre el hilo de la etapa
+        transformar: Función que se aplica en el hilo a cada elemento (opcional)
+        capacidad: Máximo de elementos producidos que pueden esperar al consumidor
+        nombre: Nombre de la etapa en el hilo y en las métricas
+
+    Yields:
+        Los elementos del iterable (transformados, si se indicó `transformar`), en el
+        mismo orden
+    """
+    cola = queue.Queue(maxsize=max(1, capacidad))
+    detener = threading.Event()
+    hilo = threading.Thread(target=_producir, args=(iterable, transformar, cola, detener, nombre),
+                            name=f"etiquetas-{nombre}", daemon=True)
+    hilo.start()
+    try:
+        while True:
+            elemento = cola.get()
+            if elemento is _FIN:
+                return
+            if isinstance(elemento, _Error):
+                raise elemento.excepcion
+            yield elemento
+    finally:
+        detener.set()
+        hilo.join()
@@ -0,0 +1,302 @@
+import re
+import zipfile
+import posixpath
+import xml.etree.ElementTree as ET
+
+# Espacios de nombres de los archivos XML dentro de un .xlsx
+NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+NS_REL_DOC = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+NS_REL_PKG = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+_FILA_RE = re.compile(rb'<row\b[^>]*?(?:/>|>.*?</row>)', re.S)
+_CELDA_RE = re.compile(rb'<c\b[^>]*?(?:/>|>.*?</c>)', re.S)
+_REF_FILA_RE = re.compile(rb'<row\b[^>]*?\br="(\d+)"')
+_REF_CELDA_RE = re.compile(rb'<c\b[^>]*?\br="([A-Z]+)(\d+)"')
+_ESTILO_RE = re.compile(rb'<c\b[^>]*?\b(s="\d+")')
+
+
+def escape(texto):
+    """Escapa &, < y > para un texto XML (como xml.sax.saxutils.escape, que importa urllib)."""
+    return texto.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+class FormatoNoSoportado(ValueError):
+    """El libro tiene una estructura que la edición directa del XML no contempla."""
+
+
+def _indice_columna(letras):
+    """Convierte una referencia de columna ('A', 'M', 'AB') en su número (1, 13, 28)."""
+    indice = 0
+    for letra in letras:
+        indice = indice * 26 + (letra - 64 if isinstance(letra, int) else ord(letra) - 64)
+    return indice
+
+
+def _ruta_hoja(libro, hoja=None):
+    """Devuelve la ruta dentro del zip de una hoja del libro.
+
+    Args:
+        libro: ZipFile del libro abierto
+        hoja: Nombre de la hoja, su posición (0 = primera) o None para la primera
+    """
+    workbook = ET.fromstring(libro.read("xl/workbook.xml"))
+    hojas = workbook.findall(f"{NS_MAIN}sheets/{NS_MAIN}sheet")
+    if not hojas:
+        raise FormatoNoSoportado("El libro no tiene hojas")
+    if hoja is None:
+        elegida = hojas[0]
+    elif isinstance(hoja, int):
+        if not 0 <= hoja < len(hojas):
+            raise FormatoNoSoportado(f"El libro no tiene la hoja número {hoja}")
+        elegida = hojas[hoja]
+    else:
+        elegida = next((elemento for elemento in hojas if elemento.get("name") == hoja), None)
+        if elegida is None:
+            raise FormatoNoSoportado(f"El libro no tiene la hoja '{hoja}'")
+    rel_id = elegida.get(f"{NS_REL_DOC}id")
+
+    relaciones = ET.fromstring(libro.read("xl/_rels/workbook.xml.rels"))
+    for relacion in relaciones.iter(f"{NS_REL_PKG}Relationship"):
+        if relacion.get("Id") == rel_id:
+            destino = relacion.get("Target")
+            if destino.startswith("/"):
+                return destino.lstrip("/")
+            return posixpath.normpath(posixpath.join("xl", destino))
+    raise FormatoNoSoportado(f"No se encontró la hoja '{elegida.get('name')}' del libro")
+
+
+def nombres_hojas(path):
+    """Devuelve los nombres de las hojas de un .xlsx, en orden.
+
+    Args:
+        path: Ruta del libro
+    """
+    with zipfile.ZipFile(path) as libro:
+        workbook = ET.fromstring(libro.read("xl/workbook.xml"))
+    return [elemento.get("name") for elemento in workbook.findall(f"{NS_MAIN}sheets/{NS_MAIN}sheet")]
+
+
+def _cadenas_compartidas(libro):
+    """Lee la tabla de cadenas compartidas del libro (vacía si no existe)."""
+    try:
+        contenido = libro.read("xl/sharedStrings.xml")
+    except KeyError:
+        return []
+    raiz = ET.fromstring(contenido)
+    return ["".join(t.text or "" for t in si.iter(f"{NS_MAIN}t")) for si in raiz.iter(f"{NS_MAIN}si")]
+
+
+def _texto_celda(celda, libro, cache):
+    """Devuelve el texto de una celda XML, resolviendo las cadenas compartidas."""
+    elemento = ET.fromstring(celda.replace(b"<c ", b'<c xmlns="%s" ' % NS_MAIN[1:-1].encode(), 1))
+    tipo = elemento.get("t")
+    if tipo == "inlineStr":
+        return "".join(t.text or "" for t in elemento.iter(f"{NS_MAIN}t"))
+    valor = elemento.find(f"{NS_MAIN}v")
+    if valor is None or valor.text is None:
+        return None
+    if tipo == "s":
+        if "compartidas" not in cache:
+            cache["compartidas"] = _cadenas_compartidas(libro)
+        return cache["compartidas"][int(valor.text)]
+    return valor.text
+
+
+def _celda(columna, fila, valor, estilo=b""):
+    """Construye el XML de una celda numérica o de texto."""
+    ref = b"%s%d" % (columna, fila)
+    if valor.isdigit():
+        return b'<c r="%s"%s><v>%s</v></c>' % (ref, estilo, valor.encode())
+    return b'<c r="%s"%s t="inlineStr"><is><t>%s</t></is></c>' % (ref, estilo, escape(valor).encode("utf-8"))
+
+
+def _actualizar_fila(fila_xml, numero, columna, valor):
+    """Reemplaza o inserta la celda de la columna indicada dentro de una fila XML."""
+    if fila_xml.endswith(b"/>") and not fila_xml.endswith(b"</row>"):
+        # Fila vacía autocerrada: abrirla para añadir la celda
+        return fila_xml[:-2].rstrip() + b">" + _celda(columna, numero, valor) + b"</row>"
+
+    objetivo = _indice_columna(columna)
+    for celda in _CELDA_RE.finditer(fila_xml):
+        ref = _REF_CELDA_RE.match(celda.group(0))
+        if ref is None:
+            raise FormatoNoSoportado("Celda sin referencia explícita")
+        indice = _indice_columna(ref.group(1))
+        if indice == objetivo:
+            estilo = _ESTILO_RE.match(celda.group(0))
+            nueva = _celda(columna, numero, valor, b" " + estilo.group(1) if estilo else b"")
+            return fila_xml[:celda.start()] + nueva + fila_xml[celda.end():]
+        if indice > objetivo:
+            return fila_xml[:celda.start()] + _celda(columna, numero, valor) + fila_xml[celda.start():]
+
+    fin = fila_xml.rindex(b"</row>")
+    return fila_xml[:fin] + _celda(columna, numero, valor) + fila_xml[fin:]
+
+
+def _valor_celda(celda, compartidas):
+    """Devuelve el valor de un elemento <c> ya interpretado: texto, número o None.
+
+    Los textos vacíos se devuelven como None, igual que pandas los lee como NaN; así
+    escriben pandas y openpyxl las celdas vacías (<c t="inlineStr"/>).
+    """
+    tipo = celda.get("t")
+    if tipo == "inlineStr":
+        return "".join(t.text or "" for t in celda.iter(f"{NS_MAIN}t")) or None
+    valor = celda.find(f"{NS_MAIN}v")
+    if valor is None or valor.text is None:
+        return None
+    if tipo == "s":
+        return compartidas[int(valor.text)] or None
+    if tipo in ("str", "e"):
+        return (valor.text or None) if tipo == "str" else None
+    if tipo == "b":
+        return valor.text == "1"
+    numero = float(valor.text)
+    return int(numero) if numero.is_integer() else numero
+
+
+def leer_filas_xlsx(path, hoja=None, columnas=None):
+    """Recorre las filas de datos de una hoja sin cargar el libro entero en memoria.
+
+    Solo usa la biblioteca estándar, por lo que sirve para consultas rápidas (contar,
+    validar) sin importar pandas ni openpyxl.
+
+    Args:
+        path: Ruta del libro .xlsx
+        hoja: Nombre de la hoja, su posición (0 = primera) o None para la primera
+        columnas: Encabezados de las columnas a devolver (None para todas)
+
+    Yields:
+        Primero la lista de encabezados de la hoja y después, por cada fila de datos,
+        un diccionario {encabezado: valor} con las columnas pedidas que tengan valor
+
+    Raises:
+        FormatoNoSoportado: Si el libro o la hoja no tienen la estructura esperada
+    """
+    with zipfile.ZipFile(path) as libro:
+        ruta_hoja = _ruta_hoja(libro, hoja)
+        compartidas = _cadenas_compartidas(libro)
+        encabezados = None
+        anterior = 0
+        vacias = 0
+        with libro.open(ruta_hoja) as contenido:
+            for _, elemento in ET.iterparse(contenido):
+                if elemento.tag != f"{NS_MAIN}row":
+                    continue
+                numero = int(elemento.get("r", anterior + 1))
+                # Filas sin celdas en el XML, que pandas lee como filas vacías
+                vacias += numero - anterior - 1
+                anterior = numero
+                valores = {}
+                for celda in elemento.iter(f"{NS_MAIN}c"):
+                    ref = celda.get("r")
+                    if ref is None:
+                        raise FormatoNoSoportado("Celda sin referencia explícita")
+                    valor = _valor_celda(celda, compartidas)
+                    if valor is not None:
+                        valores[ref.rstrip("0123456789")] = valor
+                elemento.clear()
+
+                if encabezados is None:
+                    # La primera fila con contenido es la de encabezados, igual que en pandas
+                    if not valores:
+                        continue
+                    encabezados = {letra: str(texto) for letra, texto in valores.items()
+                                   if columnas is None or str(texto) in columnas}
+                    yield [str(texto) for texto in valores.values()]
+                    vacias = 0
+                    continue
+                if not valores:
+                    vacias += 1
+                    continue
+                # Las filas vacías solo cuentan si hay datos después, igual que en pandas
+                for _ in range(vacias):
+                    yield {}
+                vacias = 0
+                yield {encabezados[letra]: valor for letra, valor in valores.items() if letra in encabezados}
+        if encabezados is None:
+            yield []
+
+
+def actualizar_columna_xlsx(origen, destino, encabezado, valores, hoja=None):
+    """Copia un .xlsx cambiando solo algunas celdas de una columna de una hoja.
+
+    Edita directamente el XML de la hoja; el resto del libro (estilos, otras hojas,
+    formatos) se copia sin interpretarlo.
+
+    Args:
+        origen: Ruta del libro original
+        destino: Ruta del libro a escribir
+        encabezado: Texto del encabezado de la columna a modificar
+        valores: Diccionario {fila de datos (0 = primera tras el encabezado): texto}
+        hoja: Nombre de la hoja, su posición (0 = primera) o None para la primera
+
+    Raises:
+        FormatoNoSoportado: Si el libro no tiene la estructura esperada (por ejemplo,
+            si la columna no existe); en ese caso conviene usar openpyxl
+    """
+    with zipfile.ZipFile(origen) as libro:
+        ruta_hoja = _ruta_hoja(libro, hoja)
+        hoja = libro.read(ruta_hoja)
+
+        inicio = hoja.find(b"<sheetData>")
+        fin = hoja.find(b"</sheetData>")
+        if inicio < 0 or fin < 0:
+            raise FormatoNoSoportado("La hoja no tiene filas")
+        inicio += len(b"<sheetData>")
+
+        partes = [hoja[:inicio]]
+        pendientes = None
+        columna = None
+        cache = {}
+        posicion = inicio
+
+        for fila in _FILA_RE.finditer(hoja, inicio, fin):
+            fila_xml = fila.group(0)
+            ref = _REF_FILA_RE.match(fila_xml)
+            if ref is None:
+                raise FormatoNoSoportado("Fila sin referencia explícita")
+            numero = int(ref.group(1))
+
+            if pendientes is None:
+                # La primera fila con contenido es la de encabezados, igual que en pandas
+                celdas = list(_CELDA_RE.finditer(fila_xml))
+                textos = {}
+                for celda in celdas:
+                    ref_celda = _REF_CELDA_RE.match(celda.group(0))
+                    if ref_celda is None:
+                        raise FormatoNoSoportado("Celda sin referencia explícita")
+                    textos[ref_celda.group(1)] = _texto_celda(celda.group(0), libro, cache)
+                if not any(texto is not None for texto in textos.values()):
+                    continue
+                columna = next((letra for letra, texto in textos.items() if texto == encabezado), None)
+                if columna is None:
+                    raise FormatoNoSoportado(f"No existe la columna '{encabezado}'")
+                pendientes = sorted((numero + 1 + fila_datos, str(valor)) for fila_datos, valor in valores.items())
+                pendientes.reverse()
+                continue
+
+            # Filas nuevas para los datos que no tenían ninguna celda en el XML
+            while pendientes and pendientes[-1][0] < numero:
+                numero_nuevo, valor = pendientes.pop()
+                partes.append(hoja[posicion:fila.start()])
+                partes.append(b'<row r="%d">%s</row>' % (numero_nuevo, _celda(columna, numero_nuevo, valor)))
+                posicion = fila.start()
+
+            if pendientes and pendientes[-1][0] == numero:
+                _, valor = pendientes.pop()
+                partes.append(hoja[posicion:fila.start()])
+                partes.append(_actualizar_fila(fila_xml, numero, columna, valor))
+                posicion = fila.end()
+
+        if pendientes is None:
+            raise FormatoNoSoportado("La hoja no tiene encabezados")
+        partes.append(hoja[posicion:fin])
+        for numero_nuevo, valor in reversed(pendientes):
+            partes.append(b'<row r="%d">%s</row>' % (numero_nuevo, _celda(columna, numero_nuevo, valor)))
+        partes.append(hoja[fin:])
+
+        with zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED) as salida:
+            for info in libro.infolist():
+                contenido = b"".join(partes) if info.filename == ruta_hoja else libro.read(info)
+                salida.writestr(info, contenido)